@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+from property_index import normalize_text
+
+QUANTILES = (0.25, 0.5, 0.75)
+
+
+def district_of(address):
+    """District part of an address: the component before the province"""
+    parts = [part.strip() for part in str(address).split(',') if part.strip()]
+    if len(parts) < 2:
+        return ""
+    return normalize_text(parts[-2])
+
+
+class AggregateCube:
+    """Precomputed listing statistics per (district, bedrooms, house direction).
+
+    Built once with the search index. Each cell holds the listing count,
+    count/min/max/sum and quartiles of Price and Area, value counts of the
+    legal and furniture states and a few sample rows. A question whose
+    filters are only districts, a minimum bedroom count and a direction is
+    answered by merging the matching cells instead of filtering the frame.
+    Quartiles are exact only when one cell matches, so they are reported
+    only then. select() returns None for anything else and callers compute
+    the statistics live.
+    """
+
+    MEASURES = ['Price', 'Area']
+    CATEGORY_MEASURES = ['Legal status', 'Furniture state']
+    SAMPLES = 3
+
+    def __init__(self, properties, address_index, seed=0):
+        frame = pd.DataFrame({
+            'district': [district_of(address) for address in properties['Address']],
+            'bedrooms': pd.to_numeric(properties['Bedrooms'], errors='coerce'),
+            'direction': properties['House direction'].astype(str),
+        })
+        for column in self.MEASURES:
+            frame[column] = pd.to_numeric(properties[column], errors='coerce')
+        for column in self.CATEGORY_MEASURES:
+            frame[column] = properties[column].astype(str)
+
+        groups = frame.groupby(['district', 'bedrooms', 'direction'], dropna=False, sort=True)
+        keys = groups.size()
+        self.size = len(keys)
+        self.counts = keys.to_numpy(dtype=np.int64)
+
+        # Dimension codes of every cell
+        districts = keys.index.get_level_values('district')
+        self.districts = sorted(set(districts))
+        district_ids = {district: i for i, district in enumerate(self.districts)}
+        self.cell_district = np.fromiter((district_ids[d] for d in districts), dtype=np.int32, count=self.size)
+        self.cell_bedrooms = keys.index.get_level_values('bedrooms').to_numpy(dtype=np.float64)
+        directions = keys.index.get_level_values('direction')
+        self.directions = sorted(set(directions))
+        direction_ids = {direction: i for i, direction in enumerate(self.directions)}
+        self.cell_direction = np.fromiter((direction_ids[d] for d in directions), dtype=np.int32, count=self.size)
+
+        # Mergeable numeric measures, plus per-cell quartiles
+        self.measures = {}
+        for column in self.MEASURES:
+            stats = groups[column].agg(['count', 'min', 'max', 'sum'])
+            quantiles = groups[column].quantile(list(QUANTILES)).unstack().reindex(keys.index)
+            self.measures[column] = {
+                'count': stats['count'].to_numpy(dtype=np.int64),
+                'min': stats['min'].to_numpy(dtype=np.float64),
+                'max': stats['max'].to_numpy(dtype=np.float64),
+                'sum': stats['sum'].to_numpy(dtype=np.float64),
+                'quantiles': quantiles.to_numpy(dtype=np.float64),
+            }
+
+        # Value counts of the categorical measures, one column per value
+        self.category_counts = {}
+        for column in self.CATEGORY_MEASURES:
+            table = groups[column].value_counts().unstack(fill_value=0).reindex(keys.index, fill_value=0)
+            self.category_counts[column] = (list(table.columns), table.to_numpy(dtype=np.int64))
+
+        # A few random rows per cell for the listings shown with the statistics
+        cell_of_row = groups.ngroup().to_numpy()
+        order = np.random.default_rng(seed).permutation(len(frame))
+        self.samples = np.full((self.size, self.SAMPLES), -1, dtype=np.int64)
+        filled = np.zeros(self.size, dtype=np.int64)
+        for row in order:
+            cell = cell_of_row[row]
+            if filled[cell] < self.SAMPLES:
+                self.samples[cell, filled[cell]] = row
+                filled[cell] += 1
+
+        # Districts whose name selects exactly their own rows in the address lookup,
+        # so a location filter on them matches the cube (others contain a street or
+        # project named like the district and are filtered live)
+        row_district = self.cell_district[cell_of_row]
+        self.exact_districts = {}
+        for district_id, district in enumerate(self.districts):
+            if district and np.array_equal(address_index.lookup(district), row_district == district_id):
+                self.exact_districts[district] = district_id
+
+    def select(self, locations=None, min_bedrooms=None, direction=None):
+        """Mask of the cells matching the filters, or None if the cube cannot answer"""
+        cells = np.ones(self.size, dtype=bool)
+        if locations:
+            district_ids = []
+            for location in locations:
+                district_id = self.exact_districts.get(normalize_text(location))
+                if district_id is None:
+                    return None
+                district_ids.append(district_id)
+            cells &= np.isin(self.cell_district, district_ids)
+        if min_bedrooms is not None:
+            cells &= self.cell_bedrooms >= min_bedrooms
+        if direction is not None:
+            # Same normalization as the live direction filter
+            cleaned = direction.strip().lower().replace('-', '').replace(' ', '')
+            matching = [i for i, value in enumerate(self.directions)
+                        if value.strip().lower().replace('-', '').replace(' ', '') == cleaned]
+            cells &= np.isin(self.cell_direction, matching)
+        # Empty results take the live path (it falls back to a text search on the location)
+        if not self.counts[cells].sum():
+            return None
+        return cells
+
+    def stats(self, cells, column):
+        """count/min/max/mean of a numeric column over the cells (quartiles for one cell)"""
+        measure = self.measures[column]
+        counts = measure['count'][cells]
+        valid = counts > 0
+        if not valid.any():
+            return None
+        result = {
+            'count': int(counts.sum()),
+            'min': float(measure['min'][cells][valid].min()),
+            'max': float(measure['max'][cells][valid].max()),
+            'mean': float(measure['sum'][cells].sum() / counts.sum()),
+        }
+        if np.count_nonzero(cells) == 1:
+            result['quantiles'] = dict(zip(QUANTILES, measure['quantiles'][cells][0]))
+        return result
+
+    def value_counts(self, cells, column):
+        """Value counts of a column over the cells, most frequent first; None if not in the cube"""
+        if column in self.category_counts:
+            values, table = self.category_counts[column]
+            counts = table[cells].sum(axis=0)
+        elif column == 'House direction':
+            values = self.directions
+            counts = np.bincount(self.cell_direction[cells], weights=self.counts[cells],
+                                 minlength=len(values)).astype(np.int64)
+        elif column == 'Bedrooms':
+            bedrooms = self.cell_bedrooms[cells]
+            known = ~np.isnan(bedrooms)
+            values, inverse = np.unique(bedrooms[known], return_inverse=True)
+            counts = np.bincount(inverse, weights=self.counts[cells][known], minlength=len(values)).astype(np.int64)
+            values = values.tolist()
+        else:
+            return None
+        series = pd.Series(counts, index=values)
+        return series[series > 0].sort_values(ascending=False, kind='stable')
+
+    def sample_rows(self, cells, count, seed=None):
+        """Up to count listing rows from the cells, for the cards under the statistics"""
+        rows = self.samples[cells].ravel()
+        rows = rows[rows >= 0]
+        return np.random.default_rng(seed).permutation(rows)[:count]
@@ -1,599 +1,588 @@
-import pandas as pd
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import nltk
-import re
-import random
-from datetime import datetime
-import json
-from langchain_community.llms import LlamaCpp
-from openai import OpenAI
-from user_context_db import UserContextDatabase
-
-
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key="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",  
-)
-
-class RealEstateChatbot:
-    def __init__(self, property_data, document):
-        self.properties = property_data
-        self.document = document
-        self.last_filtered_properties = pd.DataFrame()
-        self.last_shown_index = 0
-        self.db = UserContextDatabase()
-        self.user_id = f"user_{random.randint(10000, 99999)}"
-
-        # Fill NaN values to avoid issues
-        self.properties = self.properties.fillna({
-            'description': '',
-            'Address': '',
-            'Price': 0,
-            'Area': 0,
-            'Bedrooms': 0,
-            'Bathrooms': 0,
-            'House direction': 'Không có thông tin',
-            'Balcony direction': 'Không có thông tin',
-            'Legal status': 'Không có thông tin',
-            'Furniture state': 'Không có thông tin'
-        })
-        
-        self.conversation_history = []
-        self.user_preferences = {
-            'user_id': self.user_id,
-            'min_price': None,
-            'max_price': None,
-            'min_area': None,
-            'max_area': None,
-            'bedrooms': None,
-            'bathrooms': None,
-            'locations': [],
-            'house_direction': None,
-            'furniture_state': None,
-            'legal_state': None
-        }
-        self.staff_suggestions = None
-        
-        # Create combined text for better search
-        self.properties['search_text'] = self.properties.apply(
-            lambda row: self._create_search_text(row), axis=1
-        )
-        
-        # Prepare vectorizer for text similarity
-        self.vectorizer = TfidfVectorizer(
-            analyzer='word',
-            ngram_range=(1, 2),
-            min_df=2,
-            max_df=0.95,
-            stop_words=['và', 'có', 'là', 'với', 'tại', 'trong', 'của']
-        )
-        self.search_vectors = self.vectorizer.fit_transform(self.properties['search_text'])
-        
-        # Extract location data
-        self.locations = set()
-        for address in self.properties['Address']:
-            parts = [p.strip() for p in str(address).split(',')]
-            self.locations.update(parts)
-        
-    def _create_search_text(self, row):
-        """Create a combined text representation for search purposes"""
-        search_text = f"{row['Address']} {row['description']} {row['House direction']} {row['Balcony direction']} "
-        search_text += f"{row['Legal status']} {row['Furniture state']} {row['Bedrooms']} phòng ngủ {row['Bathrooms']} phòng tắm "
-        search_text += f"{row['Area']} m2 {row['Price']} tỷ"
-        return search_text
-                
-    def normalize(self,locations):
-        normalized_locations = []
-        for text in locations:
-            normalized_locations.append(
-                text.lower()
-                .replace("quận", "quận") # handle weird accents  
-                .strip()
-            )
-        return normalized_locations
-
-    def _filter_properties(self, df=None):
-        """Filter properties based on user preferences"""
-        if df is None:
-            filtered = self.properties.copy()
-        else:
-            filtered = df.copy()
-
-        # Filter by price
-        if self.user_preferences['min_price'] is not None:
-            filtered = filtered[filtered['Price'] >= self.user_preferences['min_price']]
-        if self.user_preferences['max_price'] is not None:
-            filtered = filtered[filtered['Price'] <= self.user_preferences['max_price']]
-        
-        # Filter by area
-        if self.user_preferences['min_area'] is not None:
-            filtered = filtered[filtered['Area'] >= self.user_preferences['min_area']]
-        if self.user_preferences['max_area'] is not None:
-            filtered = filtered[filtered['Area'] <= self.user_preferences['max_area']]
-        
-        # Filter by bedrooms
-        if self.user_preferences['bedrooms'] is not None:
-            filtered = filtered[filtered['Bedrooms'] >= self.user_preferences['bedrooms']]
-        
-        # Filter by bathrooms
-        if self.user_preferences['bathrooms'] is not None:
-            filtered = filtered[filtered['Bathrooms'] >= self.user_preferences['bathrooms']]
-        
-        # Filter by location (combine matches from all locations)
-        if self.user_preferences['locations']:
-            locations = self.user_preferences['locations']
-            result_sets = []
-
-            for loc in locations:
-                normalized_query = self.normalize([loc])[0]
-
-                # Find all rows where the normalized address contains the normalized query
-                matches = filtered[filtered['Address'].apply(
-                    lambda x: re.search(rf'\b{re.escape(normalized_query)}\b', self.normalize([x])[0]) is not None
-                )]
-
-                result_sets.append(matches)
-
-            # Combine all matched rows (union) and remove duplicates
-            if result_sets:
-                combined_matches = pd.concat(result_sets).drop_duplicates()
-                if combined_matches.empty:
-                    # Fall back to vector search on full combined location string
-                    location_query = ' '.join(locations)
-                    query_vector = self.vectorizer.transform([location_query])
-                    all_similarity_scores = cosine_similarity(query_vector, self.search_vectors).flatten()
-                    filtered['similarity_score'] = all_similarity_scores[filtered.index]
-                    location_threshold = 0.3  
-                    filtered = filtered[filtered['similarity_score'] >= location_threshold]
-                    filtered = filtered.sort_values('similarity_score', ascending=False)
-                else:
-                    filtered = combined_matches
-        
-
-        # Filter by direction
-        if self.user_preferences['house_direction'] is not None:
-            user_dir = self.user_preferences['house_direction'].strip().lower()
-
-            def is_exact_direction(dir_value):
-                # Normalize both user input and data by stripping, lowercasing, and removing hyphens/spaces
-                dir_cleaned = str(dir_value).strip().lower().replace('-', '').replace(' ', '')
-                user_cleaned = user_dir.replace('-', '').replace(' ', '')
-                return dir_cleaned == user_cleaned
-
-            direction_mask = filtered['House direction'].apply(is_exact_direction)
-            filtered = filtered[direction_mask]
-
-
-        
-        # Filter by requirements using vector search
-        if self.user_preferences['furniture_state']:
-            filtered = filtered[filtered['Furniture state'].apply(
-                lambda x: self.user_preferences['furniture_state'].lower() in str(x).lower()
-            )]
-        if self.user_preferences['legal_state']:
-            filtered = filtered[filtered['Legal status'].apply(
-                lambda x: self.user_preferences['legal_state'].lower() in str(x).lower()
-            )]
-    
-        filtered = filtered.sample(frac=1).reset_index(drop=True)
-        return filtered
-
-    def process_message(self, user_message, staff_suggestion):
-        """Process user message and generate response"""
-        result = self._update_user_preferences(user_message)
-
-        if staff_suggestion and user_message:
-            user_message = user_message + " " + staff_suggestion
-        elif user_message and not staff_suggestion:
-            user_message = user_message
-        else:
-            user_message = staff_suggestion
-        if isinstance(result, str):
-            response = result  # This is a direct answer to a real estate question
-        # Store the response
-        elif any(value for key, value in self.user_preferences.items() if value):
-            response = self.personalize(self._generate_response(user_message))
-        else:
-            response = "dã cập nhật thông tin của bạn. Bạn có thể hỏi tôi về bất động sản hoặc yêu cầu tìm kiếm căn hộ, nhà phố hoặc biệt thự"
-        return response
-    
-    def process_to_AI(self, user_message, staff_suggestion):
-        """Process user message and generate response"""
-        if staff_suggestion and user_message:
-            user_message = user_message + " " + staff_suggestion
-        elif user_message and not staff_suggestion:
-            user_message = user_message
-        else:
-            user_message = staff_suggestion
-
-        # Store the message
-        self.conversation_history.append({"role": "user", "message": user_message, "time": datetime.now()})
-
-        # Extract user preferences or handle real estate questions
-        result = self._update_user_preferences(user_message)
-        
-        if isinstance(result, str):
-            response = result  # This is a direct answer to a real estate question
-        # Store the response
-        elif any(value for key, value in self.user_preferences.items() if value):
-            response = self._generate_response(user_message)
-        else:
-            response = "dã cập nhật thông tin của bạn. Bạn có thể hỏi tôi về bất động sản hoặc yêu cầu tìm kiếm căn hộ, nhà phố hoặc biệt thự"
-        self.conversation_history.append({"role": "bot", "message": response, "time": datetime.now()})
-        print(self.user_preferences)
-        return response
-    
-    def personalize(self, user_message, staff_suggestion=None):
-        staff_suggestion = staff_suggestion if staff_suggestion else ""
-        prompt = f"""
-        This is user information:
-        {self.db.get_user(self.user_id)}
-        This is the system response, personalize to the user
-        {self.process_to_AI(user_message, staff_suggestion)}
-        This is the user message:
-        {user_message}
-        Keep the original meaning, but make it more personalized to the user.
-        If user mentioned keyword: nữ, the response must be Chào chị.
-        If user mentioned keyword: nam, the response must be Chào anh.
-        Keep the response gentle and friendly.
-        Return the response only, do not return JSON or any other format.
-
-"""
-        response = client.chat.completions.create(
-            model="openai/gpt-4.1-mini",
-            messages=[
-                {"role": "system", "content": "You are an AI assistant helping to personalize the response to the user."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500,
-            temperature=0.2,
-        )
-        output_text = response.choices[0].message.content.strip()
-        return output_text
-
-    def _update_user_preferences(self, message):
-        prompt = f"""
-        Current extracted preferences: {json.dumps(self.user_preferences, ensure_ascii=False)}
-        Current user information: {json.dumps(getattr(self, 'user_information', {}), ensure_ascii=False)}
-        This is the document written by staff, read it, analyze it and responding must follow the document:
-        {self.document}
-
-        1. Extracting and updating their real estate preferences and personal information
-        2. Answering questions about real estate concepts in a clear, concise, and friendly way
-
-        Please follow the logic below depending on the user's message:
-
-        ---
-
-        **Case 1: If the message is a real estate question**  
-        (e.g., "mét vuông là gì", "lộ giới là gì", "sổ hồng là sao?", etc.)
-
-        Respond with a short and clear explanation in Vietnamese.  
-        Do **not** return JSON.  
-        Keep it conversational and helpful.
-
-        ---
-
-        **Case 2: If the message provides user preferences or personal information**
-
-        Extract the data and return it wrapped in this format:
-        If user not mentioned any keyword in: tìm, nhà, căn hộ, biệt thự, đất, etc. Just return ONE JSON block about user information only.        
-        <json>
-        {{
-            "user_preferences": {{
-                "min_price": float or null (in **billion VND**),
-                "max_price": float or null (in **billion VND**),
-                "min_area": float or null (in m²),
-                "max_area": float or null (in m²),
-                "bedrooms": int or null,
-                "bathrooms": int or null,
-                "locations": list of strings,
-                "house_direction": string or null,
-                "legal_state": string or null, (if user mentioned "sổ đỏ", "sổ hồng", "sổ chung", "sổ riêng", etc. return Have Certificate)
-                "furniture_state": string or null
-            }},
-            "user_information": {{
-                "name": str or null,
-                "age": int or null,
-                "gender": str or null,
-                "income_level": str or null,
-                "budget": str or null,
-                "owned_assets": str or null,
-                "hobbies": str or null,
-                "preferred_brands": str or null,
-                "family_info": str or null,
-            }}
-        }}
-        </json>
-
-        ---
-
-        If a user describes estimated travel time from a landmark (e.g. "cách quận Đống Đa khoảng 30 phút đi xe"), infer nearby districts or areas and populate the `locations` list accordingly.
-
-        If user mentions family size (e.g., “2 vợ chồng và 2 con”), you may infer:
-        - min_area, bedrooms, bathrooms based on this mapping:
-            - 1–2 people: min_area = 30, bedrooms = 1, bathrooms = 1
-            - 3–4 people: min_area = 50, bedrooms = 2, bathrooms = 1
-            - 5–6 people: min_area = 70, bedrooms = 3, bathrooms = 3
-            - >6 people: min_area = 90, bedrooms = 4, bathrooms = 4
-        Below is the user message:
-        "{message}"
-"""
-
-
-        response = client.chat.completions.create(
-            model="openai/gpt-4.1-mini",
-            messages=[
-                {"role": "system", "content": "You are an AI assistant helping to extract real estate preferences, user personal info and answering real estate questions."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500,
-            temperature=0.2,
-        )
-        output_text = response.choices[0].message.content.strip()
-        print("Model response:", output_text)
-    
-        # Check if the response is a direct answer (not JSON)
-        if not output_text.startswith("<json>"):
-            return output_text  # This is a direct answer to a real estate question
-
-        # Extract JSON inside <json>...</json> block
-        json_match = re.search(r"<json>(.*?)</json>", output_text, re.DOTALL)
-        if json_match:
-            json_data = json_match.group(1).strip()
-            try:
-                parsed_data = json.loads(json_data)
-
-                # Update user preferences
-                preferences = parsed_data.get("user_preferences", {})
-                for key, value in preferences.items():
-                    if key == "locations" and isinstance(value, list):
-                        if len(value) > 1:
-                            for loc in value:
-                                if loc not in self.user_preferences["locations"]:
-                                    self.user_preferences["locations"].append(loc)
-                        elif len(value) == 1:
-                            self.user_preferences["locations"] = None
-                            self.user_preferences["locations"] = [value[0]]
-                    else:
-                        self.user_preferences[key] = value
-
-                # Update user information
-                user_info = parsed_data.get("user_information", {})
-                if not hasattr(self, "user_information"):
-                    self.user_information = {}
-                self.user_information.update(user_info)
-
-                # Update database
-                if hasattr(self, 'db') and hasattr(self, 'user_id'):
-                    self.db.update_user(self.user_id, **self.user_information)
-
-                return True  # Indicates user preferences were updated
-            except json.JSONDecodeError as e:
-                print("❌ Failed to parse JSON from model:", e)
-                return False
-        return False
-
-
-
-        
-    
-    def _generate_response(self, user_message):
-        """Generate response based on user message and preferences"""
-        # Check if this is a greeting or general question
-        greeting_keywords = ['xin chào', 'hello', 'hi', 'chào']
-        help_keywords = ['giúp', 'tìm', 'muốn', 'cần', 'hỗ trợ','nhà','căn']
-        
-        # Process greetings
-        if any(keyword in user_message.lower() for keyword in greeting_keywords) and len(self.conversation_history) <= 1:
-            return "Xin chào! Tôi là trợ lý AI chuyên về bất động sản. Tôi có thể giúp bạn tìm kiếm căn hộ, nhà phố hoặc biệt thự theo nhu cầu của bạn. Bạn đang tìm kiếm bất động sản như thế nào? Hoặc bạn có thắc mắc nào cần giải đáp không?"
-        
-        if "thêm" in user_message.lower():
-            additional_count = 3  # default
-            match = re.search(r'thêm\s*(\d+)?', user_message.lower())
-            if match and match.group(1):
-                additional_count = int(match.group(1))
-            
-            if self.last_filtered_properties is not None and not self.last_filtered_properties.empty:
-                start = self.last_shown_index
-                end = start + additional_count
-                addition_properties = self._filter_properties(self.last_filtered_properties)
-                more_props = addition_properties.iloc[start:end]
-                
-                if more_props.empty:
-                    self._update_user_preferences(user_message)
-                    additional_properties = self._filter_properties()
-                    more_props = additional_properties.iloc[start:end]
-
-                response = f"Dưới đây là {len(more_props)} bất động sản khác phù hợp:\n\n"
-                for i, (_, prop) in enumerate(more_props.iterrows(), start + 1):
-                    if not prop['description'] or pd.isna(prop['description']):
-                        description = f"Căn hộ tại {prop['Address']}, diện tích {prop['Area']}m², "
-                        description += f"{prop['Bedrooms']} phòng ngủ, {prop['Bathrooms']} phòng tắm, "
-                        description += f"hướng {prop['House direction']}, ban công hướng {prop['Balcony direction']}. "
-                        description += f"Nội thất: {prop['Furniture state']}. Mức giá: {prop['Price']} tỷ VNĐ."
-                    else:
-                        description = prop['description']
-                    response += f"{i}. {description}\n\n"
-                
-                self.last_shown_index = end
-                response += "Bạn muốn xem thêm không, hay cần điều chỉnh tiêu chí tìm kiếm?"
-                return response
-            else:
-                return "Hiện tại tôi chưa có gợi ý nào trước đó để tiếp tục. Bạn vui lòng nhập yêu cầu tìm kiếm trước nhé."
-
-        # Process help requests or general search
-        if any(keyword in user_message.lower() for keyword in help_keywords) and self.user_preferences['locations']:
-            filtered_properties = self._filter_properties()
-            
-            if len(filtered_properties) == 0:
-                return "Xin lỗi, tôi không tìm thấy bất động sản nào phù hợp với yêu cầu của bạn. Bạn có thể điều chỉnh các tiêu chí như giá, diện tích hoặc vị trí không?"
-            
-            # If we have staff suggestions, prioritize them
-            if self.staff_suggestions:
-                response = self.staff_suggestions + "\n\n"
-            else:
-                response = ""
-            
-            # Get top 3 properties
-            top_properties = filtered_properties.head(3)
-            self.last_filtered_properties = filtered_properties
-            self.last_shown_index = 3
-            
-            response += f"Tôi đã tìm thấy {len(filtered_properties)} bất động sản phù hợp với yêu cầu của bạn. Dưới đây là một số gợi ý:\n\n"
-            
-            for i, (_, prop) in enumerate(top_properties.iterrows(), 1):
-                if not prop['description'] or pd.isna(prop['description']):
-                    description = f"Căn hộ tại {prop['Address']}"
-                    
-                    if not pd.isna(prop['Area']):
-                        description += f", diện tích {prop['Area']}m²"
-                    if not pd.isna(prop['Bedrooms']):
-                        description += f", {int(prop['Bedrooms'])} phòng ngủ"
-                    if not pd.isna(prop['Bathrooms']):
-                        description += f", {int(prop['Bathrooms'])} phòng tắm"
-                    if not pd.isna(prop['House direction']):
-                        description += f", hướng {prop['House direction']}"
-                    if not pd.isna(prop['Balcony direction']):
-                        description += f", ban công hướng {prop['Balcony direction']}"
-                    if not pd.isna(prop['Furniture state']):
-                        description += f". Nội thất: {prop['Furniture state']}"
-                    if not pd.isna(prop['Price']):
-                        description += f". Mức giá: {prop['Price']} tỷ VNĐ"
-                    
-                    description += "."
-                else:
-                    description = prop['description']
-                
-                response += f"{i}. {description}\n\n"
-            return response
-        
-        
-        
-        
-        # Process feature inquiries
-        feature_keywords = {
-            'giá': 'Price', 
-            'diện tích': 'Area', 
-            'phòng ngủ': 'Bedrooms', 
-            'phòng tắm': 'Bathrooms',
-            'hướng': 'House direction',
-            'pháp lý': 'Legal status',
-            'nội thất': 'Furniture state'
-        }
-        
-        for keyword, column in feature_keywords.items():
-            if keyword in user_message.lower():
-                filtered_properties = self._filter_properties()
-                
-                if len(filtered_properties) == 0:
-                    return f"Xin lỗi, tôi không tìm thấy thông tin về {keyword} cho bất kỳ bất động sản nào phù hợp với yêu cầu của bạn."
-                
-                # Get statistics on the feature
-                if column in ['Price', 'Area']:
-                    min_val = filtered_properties[column].min()
-                    max_val = filtered_properties[column].max()
-                    avg_val = filtered_properties[column].mean()
-                    
-                    unit = "tỷ VNĐ" if column == 'Price' else "m²"
-                    
-                    response = ""
-                    response += f"Dựa trên các tiêu chí của bạn, {keyword} dao động từ {min_val:.2f} đến {max_val:.2f} {unit}, "
-                    response += f"với mức trung bình là {avg_val:.2f} {unit}.\n\n"
-                    
-                    if len(filtered_properties) > 0:
-                        response += "Dưới đây là một số lựa chọn phù hợp:\n\n"
-                        
-                        for i, (_, prop) in enumerate(filtered_properties.head(3).iterrows(), 1):
-                            if not prop['description'] or pd.isna(prop['description']):
-                                description = f"Căn hộ tại {prop['Address']}, diện tích {prop['Area']}m², "
-                                description += f"{prop['Bedrooms']} phòng ngủ, {prop['Bathrooms']} phòng tắm, "
-                                description += f"hướng {prop['House direction']}. Mức giá: {prop['Price']} tỷ VNĐ."
-                            else:
-                                description = prop['description']
-                            
-                            response += f"{i}. {description}\n\n"
-                    
-                    return response
-                else:
-                    value_counts = filtered_properties[column].value_counts()
-                    
-                    response += f"Dựa trên các tiêu chí của bạn, phân bố {keyword} như sau:\n\n"
-                    
-                    for value, count in value_counts.items():
-                        response += f"- {value}: {count} căn\n"
-                    
-                    response += "\nDưới đây là một số lựa chọn phù hợp:\n\n"
-                    
-                    for i, (_, prop) in enumerate(filtered_properties.head(3).iterrows(), 1):
-                        if not prop['description'] or pd.isna(prop['description']):
-                            description = f"Căn hộ tại {prop['Address']}, diện tích {prop['Area']}m², "
-                            description += f"{prop['Bedrooms']} phòng ngủ, {prop['Bathrooms']} phòng tắm, "
-                            description += f"hướng {prop['House direction']}. Mức giá: {prop['Price']} tỷ VNĐ."
-                        else:
-                            description = prop['description']
-                        
-                        response += f"{i}. {description}\n\n"
-                    
-                    return response
-        
-        # Search using vector search for general inquiries
-        vectorized_query = self.vectorizer.transform([user_message])
-        similarity_scores = cosine_similarity(vectorized_query, self.search_vectors).flatten()
-        
-        # Create a copy of properties with similarity scores
-        scored_properties = self.properties.copy()
-        scored_properties['similarity_score'] = similarity_scores
-        
-        # Filter properties with meaningful similarity
-        search_threshold = 0.1  # Adjust as needed
-        relevant_properties = scored_properties[scored_properties['similarity_score'] >= search_threshold]
-        
-        if len(relevant_properties) > 0:
-            # Sort by similarity score
-            relevant_properties = relevant_properties.sort_values('similarity_score', ascending=False)
-            
-            response = ""
-            response += f"Dựa trên yêu cầu của bạn, tôi đã tìm thấy {len(relevant_properties)} bất động sản phù hợp. Đây là một số gợi ý hàng đầu:\n\n"
-            
-            for i, (_, prop) in enumerate(relevant_properties.head(3).iterrows(), 1):
-                if not prop['description'] or pd.isna(prop['description']):
-                    description = f"Căn hộ tại {prop['Address']}, diện tích {prop['Area']}m², "
-                    description += f"{prop['Bedrooms']} phòng ngủ, {prop['Bathrooms']} phòng tắm, "
-                    description += f"hướng {prop['House direction']}, ban công hướng {prop['Balcony direction']}. "
-                    description += f"Nội thất: {prop['Furniture state']}. Mức giá: {prop['Price']} tỷ VNĐ."
-                else:
-                    description = prop['description']
-                
-                response += f"{i}. {description}\n\n"
-            
-            response += "Bạn có muốn biết thêm thông tin về bất kỳ căn hộ nào trong số này không?"
-            
-            return response
-        
-        # Default response if we can't categorize the query
-        return "Xin lỗi, tôi không hiểu rõ yêu cầu của bạn. Bạn có thể cho tôi biết bạn đang tìm kiếm bất động sản như thế nào về giá cả, diện tích, vị trí hoặc các tiêu chí khác không?"
-
-    def get_user_preferences(self):
-        """Return current user preferences for debugging"""
-        return self.user_preferences
-
-    def reset_conversation(self):
-        """Reset the conversation history and preferences"""
-        self.conversation_history = []
-        self.user_preferences = {
-            'min_price': None,
-            'max_price': None,
-            'min_area': None,
-            'max_area': None,
-            'bedrooms': None,
-            'bathrooms': None,
-            'locations': [],
-            'house_direction': None,
-            'furniture_state': None,
-            'legal_state': None
-        }
-        self.staff_suggestions = None
-        
\ No newline at end of file
+import numpy as np
+import nltk
+import re
+import random
+import uuid
+from datetime import datetime
+import json
+import os
+from langchain_community.llms import LlamaCpp
+from llm_gateway import gateway_from_env, LLMUnavailableError, RETRYABLE_ERRORS
+from user_context_db import UserContextDatabase
+from property_index import normalize_text, ResultCursor
+from search_index import build_search_index
+from document_store import index_document
+from response_cache import ResponseCache, is_generic_question
+from prompt_builder import PromptBuilder
+
+
+API_KEY = os.environ.get("OPENROUTER_API_KEY", "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")
+
+# Shared, pooled LLM client with deadlines, retries and fallback models,
+# created on first use so that forked server processes each open their own
+_default_llm = None
+_default_llm_pid = None
+
+
+def default_llm():
+    """Return this process's shared LLM gateway, creating it on first use."""
+    global _default_llm, _default_llm_pid
+    if _default_llm is None or _default_llm_pid != os.getpid():
+        _default_llm = gateway_from_env(api_key=API_KEY)
+        _default_llm_pid = os.getpid()
+    return _default_llm
+
+# Extraction prompts and their token counters, shared across sessions
+default_prompt_builder = PromptBuilder()
+
+class RealEstateChatbot:
+    def __init__(self, property_data, document, structured_output=False, search_index=None, db=None,
+                 document_token_budget=800, response_cache=None, llm_gateway=None, prompt_builder=None,
+                 user_id=None):
+        self.properties = property_data
+        self.llm = llm_gateway or default_llm()
+        self.prompt_builder = prompt_builder or default_prompt_builder
+        # Answers to generic real estate questions, shared across sessions (optional)
+        self.response_cache = response_cache
+        # Only the passages relevant to each message are put in the prompt
+        self.document_token_budget = document_token_budget
+        self.set_document(document)
+        # When enabled, preferences and the personalized reply come back from one completion
+        self.structured_output = structured_output
+        self.pending_reply = None
+        # Ranked rows of the last search, served page by page for "thêm"
+        self.result_cursor = None
+        self.db = db if db is not None else UserContextDatabase()
+        # Random and long enough that two sessions never share a user row
+        self.user_id = user_id or f"user_{uuid.uuid4().hex}"
+
+        # Cleaned frame and TF-IDF vectors, loaded from the saved artifact when available
+        if search_index is None:
+            search_index = build_search_index(property_data)
+        self.properties = search_index.properties
+        self.vectorizer = search_index.vectorizer
+        self.search_vectors = search_index.search_vectors
+        self.retriever = search_index.retriever
+        # General inquiries use the embedding index when one is loaded
+        self.semantic_retriever = search_index.dense_retriever or search_index.retriever
+        
+        self.conversation_history = []
+        self.user_preferences = {
+            'user_id': self.user_id,
+            'min_price': None,
+            'max_price': None,
+            'min_area': None,
+            'max_area': None,
+            'bedrooms': None,
+            'bathrooms': None,
+            'locations': [],
+            'house_direction': None,
+            'furniture_state': None,
+            'legal_state': None
+        }
+        self.staff_suggestions = None
+
+        # Column and address indexes used by _filter_properties (shared, read-only)
+        self.property_index = search_index.property_index
+        self.address_index = search_index.address_index
+        self.locations = self.address_index.locations
+        # Formats result pages for every branch of _generate_response
+        self.renderer = search_index.renderer
+        # Precomputed statistics for the feature questions
+        self.aggregate_cube = search_index.aggregate_cube
+        self.preference_extractor = search_index.preference_extractor
+        
+    def set_document(self, document):
+        """Use a staff document (plain text) for the following messages"""
+        self.document = document
+        self.document_index = index_document(document) if document else None
+        # Cached answers must follow the document they were generated with
+        self.document_key = ResponseCache.context_key(document)
+
+    def _document_context(self, message, token_budget=None):
+        """Passages of the staff document relevant to message, within the token budget"""
+        if self.document_index is None:
+            return self.document
+        if token_budget is None or token_budget > self.document_token_budget:
+            token_budget = self.document_token_budget
+        return self.document_index.relevant_passages(message, token_budget)
+
+    def normalize(self,locations):
+        return [normalize_text(text) for text in locations]
+
+    def _filter_properties(self, df=None, seed=None):
+        """Filter properties based on user preferences"""
+        return self.properties.iloc[self._filter_rows(df, seed)]
+
+    def _filter_rows(self, df=None, seed=None):
+        """Row positions matching the user preferences, shuffled with the given seed"""
+        index = self.property_index
+        if df is None:
+            mask = index.all_rows()
+        else:
+            # Restrict to rows of a previous result (its index holds row positions)
+            mask = index.rows_mask(df.index)
+
+        # Filter by price
+        if self.user_preferences['min_price'] is not None or self.user_preferences['max_price'] is not None:
+            mask &= index.range_mask('Price', self.user_preferences['min_price'], self.user_preferences['max_price'])
+        
+        # Filter by area
+        if self.user_preferences['min_area'] is not None or self.user_preferences['max_area'] is not None:
+            mask &= index.range_mask('Area', self.user_preferences['min_area'], self.user_preferences['max_area'])
+        
+        # Filter by bedrooms
+        if self.user_preferences['bedrooms'] is not None:
+            mask &= index.range_mask('Bedrooms', low=self.user_preferences['bedrooms'])
+        
+        # Filter by bathrooms
+        if self.user_preferences['bathrooms'] is not None:
+            mask &= index.range_mask('Bathrooms', low=self.user_preferences['bathrooms'])
+        
+        # Filter by location (combine matches from all locations)
+        if self.user_preferences['locations']:
+            mask = self._filter_locations(mask, self.user_preferences['locations'])
+
+        # Filter by direction
+        if self.user_preferences['house_direction'] is not None:
+            # Normalize both user input and data by stripping, lowercasing, and removing hyphens/spaces
+            user_cleaned = self.user_preferences['house_direction'].strip().lower().replace('-', '').replace(' ', '')
+            mask &= index.category_mask(
+                'House direction',
+                lambda value: value.strip().lower().replace('-', '').replace(' ', '') == user_cleaned
+            )
+
+        # Filter by requirements
+        if self.user_preferences['furniture_state']:
+            furniture_state = self.user_preferences['furniture_state'].lower()
+            mask &= index.category_mask('Furniture state', lambda value: furniture_state in value.lower())
+        if self.user_preferences['legal_state']:
+            legal_state = self.user_preferences['legal_state'].lower()
+            mask &= index.category_mask('Legal status', lambda value: legal_state in value.lower())
+
+        # Shuffle the matches; the frame index keeps the row positions for later restriction
+        return np.random.default_rng(seed).permutation(np.flatnonzero(mask))
+
+    def _filter_locations(self, mask, locations):
+        """Narrow mask to rows whose address matches any of the requested locations"""
+        location_mask = self.address_index.lookup_any(locations) & mask
+
+        if location_mask.any():
+            return location_mask
+
+        # Fall back to vector search on full combined location string, scoring only the candidates
+        location_query = ' '.join(locations)
+        location_threshold = 0.3
+        rows = self.retriever.match(location_query, location_threshold, candidates=np.flatnonzero(mask))
+        return self.property_index.rows_mask(rows)
+
+    def _combine_message(self, user_message, staff_suggestion):
+        """Merge the customer message with the staff suggestion, if any"""
+        if staff_suggestion and user_message:
+            return user_message + " " + staff_suggestion
+        elif user_message and not staff_suggestion:
+            return user_message
+        return staff_suggestion
+
+    def _run_turn(self, user_message, with_reply=False):
+        """Run one extraction pass and build the templated response.
+
+        Returns (response, is_search) where is_search tells the caller that the
+        response was generated from the property data and can be personalized.
+        """
+        # Store the message
+        self.conversation_history.append({"role": "user", "message": user_message, "time": datetime.now()})
+
+        # Extract user preferences or handle real estate questions (once per turn)
+        result = self._update_user_preferences(user_message, with_reply=with_reply)
+
+        is_search = False
+        if isinstance(result, str):
+            response = result  # This is a direct answer to a real estate question
+        elif any(value for key, value in self.user_preferences.items() if value):
+            response = self._generate_response(user_message)
+            is_search = True
+        else:
+            response = "dã cập nhật thông tin của bạn. Bạn có thể hỏi tôi về bất động sản hoặc yêu cầu tìm kiếm căn hộ, nhà phố hoặc biệt thự"
+        self.conversation_history.append({"role": "bot", "message": response, "time": datetime.now()})
+        return response, is_search
+
+    def process_message(self, user_message, staff_suggestion):
+        """Process user message and generate a personalized response"""
+        user_message = self._combine_message(user_message, staff_suggestion)
+
+        if self.structured_output:
+            # One completion returns both the preferences and the personalized opening
+            response, is_search = self._run_turn(user_message, with_reply=True)
+            if is_search and self.pending_reply:
+                response = f"{self.pending_reply}\n\n{response}"
+            return response
+
+        response, is_search = self._run_turn(user_message)
+        if is_search:
+            response = self.personalize(response, user_message)
+        return response
+    
+    def process_to_AI(self, user_message, staff_suggestion):
+        """Process user message and generate response without personalization"""
+        user_message = self._combine_message(user_message, staff_suggestion)
+        response, _ = self._run_turn(user_message)
+        print(self.user_preferences)
+        return response
+    
+    def process_message_stream(self, user_message, staff_suggestion):
+        """Like process_message, but yields the response in chunks as they arrive"""
+        user_message = self._combine_message(user_message, staff_suggestion)
+
+        if self.structured_output:
+            response, is_search = self._run_turn(user_message, with_reply=True)
+            if is_search and self.pending_reply:
+                response = f"{self.pending_reply}\n\n{response}"
+            yield response
+            return
+
+        response, is_search = self._run_turn(user_message)
+        if is_search:
+            yield from self.personalize_stream(response, user_message)
+        else:
+            yield response
+
+    def process_message_framed(self, user_message, staff_suggestion):
+        """Yield the templated response at once, then a personalized framing as it streams.
+
+        Unlike process_message_stream, the listings are not rewritten by the
+        model, so they can be shown before the first token arrives.
+        """
+        user_message = self._combine_message(user_message, staff_suggestion)
+
+        if self.structured_output:
+            response, is_search = self._run_turn(user_message, with_reply=True)
+            if is_search and self.pending_reply:
+                response = f"{self.pending_reply}\n\n{response}"
+            yield response
+            return
+
+        response, is_search = self._run_turn(user_message)
+        yield response
+        if not is_search:
+            return
+
+        yield "\n\n"
+        try:
+            yield from self.llm.stream(
+                self._framing_messages(response, user_message),
+                max_tokens=200,
+                temperature=0.2,
+            )
+        except (LLMUnavailableError, *RETRYABLE_ERRORS) as e:
+            # The listings are already shown; the framing is optional
+            print("Personalized framing skipped:", e)
+
+    def _framing_messages(self, system_response, user_message):
+        prompt = f"""
+        This is user information:
+        {self.db.get_user(self.user_id)}
+        These listings were just shown to the user:
+        {system_response}
+        This is the user message:
+        {user_message}
+        Write 2-3 sentences in Vietnamese that follow the listings: relate them to the user's needs and invite the next step.
+        Do not repeat the listings.
+        If user mentioned keyword: nữ, address the user as chị.
+        If user mentioned keyword: nam, address the user as anh.
+        Keep the response gentle and friendly.
+        Return the text only, do not return JSON or any other format.
+
+"""
+        return [
+            {"role": "system", "content": "You are an AI assistant helping to personalize the response to the user."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _personalize_messages(self, system_response, user_message):
+        prompt = f"""
+        This is user information:
+        {self.db.get_user(self.user_id)}
+        This is the system response, personalize to the user
+        {system_response}
+        This is the user message:
+        {user_message}
+        Keep the original meaning, but make it more personalized to the user.
+        If user mentioned keyword: nữ, the response must be Chào chị.
+        If user mentioned keyword: nam, the response must be Chào anh.
+        Keep the response gentle and friendly.
+        Return the response only, do not return JSON or any other format.
+
+"""
+        return [
+            {"role": "system", "content": "You are an AI assistant helping to personalize the response to the user."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def personalize(self, system_response, user_message):
+        """Rewrite an already generated system response for the current user"""
+        return self.llm.complete(
+            self._personalize_messages(system_response, user_message),
+            max_tokens=500,
+            temperature=0.2,
+        )
+
+    def personalize_stream(self, system_response, user_message):
+        """Same as personalize, yielding tokens as the model produces them"""
+        yield from self.llm.stream(
+            self._personalize_messages(system_response, user_message),
+            max_tokens=500,
+            temperature=0.2,
+        )
+
+    def _apply_preferences(self, preferences):
+        """Merge extracted preferences into the current ones"""
+        for key, value in preferences.items():
+            if key == "locations" and isinstance(value, list):
+                if len(value) > 1:
+                    for loc in value:
+                        if loc not in self.user_preferences["locations"]:
+                            self.user_preferences["locations"].append(loc)
+                elif len(value) == 1:
+                    self.user_preferences["locations"] = None
+                    self.user_preferences["locations"] = [value[0]]
+            else:
+                self.user_preferences[key] = value
+
+    def _extraction_output(self, message, preferences, user_information, with_reply=False):
+        """Model output for the extraction prompt: plain text answer or a <json> block"""
+        # Static instructions first, then only what changed, within the token budget
+        messages = self.prompt_builder.extraction_messages(
+            message,
+            preferences,
+            user_information,
+            document=lambda token_budget: self._document_context(message, token_budget),
+            with_reply=with_reply,
+        )
+        output_text = self.llm.complete(
+            messages,
+            max_tokens=500,
+            temperature=0.2,
+        )
+        print("Model response:", output_text)
+        return output_text
+
+    def _update_user_preferences(self, message, with_reply=False):
+        self.pending_reply = None
+        # Simple search messages ("3 phòng ngủ, dưới 5 tỷ, Cầu Giấy") are parsed locally.
+        # Structured-output mode still needs the model for the personalized opening.
+        if not with_reply:
+            preferences, confidence = self.preference_extractor.extract(message)
+            if confidence >= self.preference_extractor.threshold:
+                print("Rule-based preferences:", preferences, f"(confidence {confidence:.2f})")
+                self._apply_preferences(preferences)
+                return True
+
+        # Generic questions ("sổ hồng là gì") get the same answer for everyone: they are
+        # answered from a prompt without this user's profile, so the answer can be shared
+        if self.response_cache is not None and is_generic_question(message):
+            cached = self.response_cache.get(message, self.document_key)
+            if cached is not None:
+                return cached
+            output_text = self._extraction_output(message, {}, {})
+            if not output_text.startswith("<json>"):
+                self.response_cache.put(message, output_text, self.document_key)
+                return output_text
+            # It carried preferences after all; extract them with the full context
+
+        output_text = self._extraction_output(
+            message,
+            self.user_preferences,
+            getattr(self, 'user_information', {}),
+            with_reply=with_reply,
+        )
+
+        # Check if the response is a direct answer (not JSON)
+        if not output_text.startswith("<json>"):
+            return output_text  # This is a direct answer to a real estate question
+
+        # Extract JSON inside <json>...</json> block
+        json_match = re.search(r"<json>(.*?)</json>", output_text, re.DOTALL)
+        if json_match:
+            json_data = json_match.group(1).strip()
+            try:
+                parsed_data = json.loads(json_data)
+
+                # Update user preferences
+                self._apply_preferences(parsed_data.get("user_preferences", {}))
+
+                # Update user information
+                user_info = parsed_data.get("user_information", {})
+                if not hasattr(self, "user_information"):
+                    self.user_information = {}
+                self.user_information.update(user_info)
+
+                # Personalized opening returned in structured-output mode
+                if with_reply:
+                    self.pending_reply = parsed_data.get("reply")
+
+                # Update database
+                if hasattr(self, 'db') and hasattr(self, 'user_id'):
+                    self.db.update_user(self.user_id, **self.user_information)
+
+                return True  # Indicates user preferences were updated
+            except json.JSONDecodeError as e:
+                print("❌ Failed to parse JSON from model:", e)
+                return False
+        return False
+
+
+
+        
+    
+    def _generate_response(self, user_message):
+        """Generate response based on user message and preferences"""
+        # Check if this is a greeting or general question
+        greeting_keywords = ['xin chào', 'hello', 'hi', 'chào']
+        help_keywords = ['giúp', 'tìm', 'muốn', 'cần', 'hỗ trợ','nhà','căn']
+        
+        # Process greetings
+        if any(keyword in user_message.lower() for keyword in greeting_keywords) and len(self.conversation_history) <= 1:
+            return "Xin chào! Tôi là trợ lý AI chuyên về bất động sản. Tôi có thể giúp bạn tìm kiếm căn hộ, nhà phố hoặc biệt thự theo nhu cầu của bạn. Bạn đang tìm kiếm bất động sản như thế nào? Hoặc bạn có thắc mắc nào cần giải đáp không?"
+        
+        if "thêm" in user_message.lower():
+            additional_count = 3  # default
+            match = re.search(r'thêm\s*(\d+)?', user_message.lower())
+            if match and match.group(1):
+                additional_count = int(match.group(1))
+            
+            if self.result_cursor is not None and len(self.result_cursor):
+                start = self.result_cursor.position
+                if not self.result_cursor.remaining:
+                    return f"Tôi đã gửi bạn tất cả {len(self.result_cursor)} bất động sản phù hợp. Bạn có muốn điều chỉnh tiêu chí tìm kiếm không?"
+                rows = self.result_cursor.next_page(additional_count)
+                return self.renderer.render('more', rows, start=start + 1, count=len(rows))
+            else:
+                return "Hiện tại tôi chưa có gợi ý nào trước đó để tiếp tục. Bạn vui lòng nhập yêu cầu tìm kiếm trước nhé."
+
+        # Process help requests or general search
+        if any(keyword in user_message.lower() for keyword in help_keywords) and self.user_preferences['locations']:
+            seed = random.randrange(2**32)
+            self.result_cursor = ResultCursor(self._filter_rows(seed=seed), seed)
+            
+            if len(self.result_cursor) == 0:
+                return "Xin lỗi, tôi không tìm thấy bất động sản nào phù hợp với yêu cầu của bạn. Bạn có thể điều chỉnh các tiêu chí như giá, diện tích hoặc vị trí không?"
+            
+            # If we have staff suggestions, prioritize them
+            staff = self.staff_suggestions + "\n\n" if self.staff_suggestions else ""
+            
+            # Get top 3 properties
+            return self.renderer.render(
+                'search', self.result_cursor.next_page(3), staff=staff, total=len(self.result_cursor)
+            )
+        
+        # Process feature inquiries
+        feature_keywords = {
+            'giá': 'Price', 
+            'diện tích': 'Area', 
+            'phòng ngủ': 'Bedrooms', 
+            'phòng tắm': 'Bathrooms',
+            'hướng': 'House direction',
+            'pháp lý': 'Legal status',
+            'nội thất': 'Furniture state'
+        }
+        
+        for keyword, column in feature_keywords.items():
+            if keyword in user_message.lower():
+                # Served from the precomputed cube when the filters allow it
+                response = self._feature_response_from_cube(keyword, column)
+                if response is not None:
+                    return response
+
+                filtered_properties = self._filter_properties()
+                
+                if len(filtered_properties) == 0:
+                    return f"Xin lỗi, tôi không tìm thấy thông tin về {keyword} cho bất kỳ bất động sản nào phù hợp với yêu cầu của bạn."
+                
+                # Get statistics on the feature
+                top_rows = filtered_properties.index[:3]
+                if column in ['Price', 'Area']:
+                    return self.renderer.render(
+                        'feature_range', top_rows,
+                        keyword=keyword,
+                        min=filtered_properties[column].min(),
+                        max=filtered_properties[column].max(),
+                        avg=filtered_properties[column].mean(),
+                        unit="tỷ VNĐ" if column == 'Price' else "m²",
+                    )
+                return self.renderer.render(
+                    'feature_counts', top_rows,
+                    keyword=keyword,
+                    distribution=self.renderer.distribution(filtered_properties[column].value_counts()),
+                )
+        
+        # Search using vector search for general inquiries (top 3 only, no full sort)
+        search_threshold = self.semantic_retriever.threshold
+        top_rows, _, match_count = self.semantic_retriever.top_k(user_message, k=3, threshold=search_threshold)
+        
+        if match_count > 0:
+            total = match_count
+            # A capped count (dense retriever) is only a lower bound
+            limit = self.semantic_retriever.count_limit
+            if limit is not None and match_count >= limit:
+                total = f"hơn {limit}"
+            return self.renderer.render('semantic', top_rows, total=total)
+        
+        # Default response if we can't categorize the query
+        return "Xin lỗi, tôi không hiểu rõ yêu cầu của bạn. Bạn có thể cho tôi biết bạn đang tìm kiếm bất động sản như thế nào về giá cả, diện tích, vị trí hoặc các tiêu chí khác không?"
+
+    def _feature_response_from_cube(self, keyword, column):
+        """Feature statistics from the aggregate cube, or None when they must be computed live"""
+        preferences = self.user_preferences
+        # The cube only has district, bedrooms and direction dimensions
+        if any(preferences[key] is not None for key in ('min_price', 'max_price', 'min_area', 'max_area', 'bathrooms')):
+            return None
+        if preferences['furniture_state'] or preferences['legal_state']:
+            return None
+
+        cube = self.aggregate_cube
+        cells = cube.select(preferences['locations'], preferences['bedrooms'], preferences['house_direction'])
+        if cells is None:
+            return None
+
+        top_rows = cube.sample_rows(cells, 3)
+        if column in ['Price', 'Area']:
+            stats = cube.stats(cells, column)
+            if stats is None:
+                return None
+            return self.renderer.render(
+                'feature_range', top_rows,
+                keyword=keyword,
+                min=stats['min'],
+                max=stats['max'],
+                avg=stats['mean'],
+                unit="tỷ VNĐ" if column == 'Price' else "m²",
+            )
+
+        counts = cube.value_counts(cells, column)
+        if counts is None:
+            return None
+        return self.renderer.render('feature_counts', top_rows, keyword=keyword,
+                                    distribution=self.renderer.distribution(counts))
+
+    def get_user_preferences(self):
+        """Return current user preferences for debugging"""
+        return self.user_preferences
+
+    def reset_conversation(self):
+        """Reset the conversation history and preferences"""
+        self.conversation_history = []
+        self.user_preferences = {
+            'min_price': None,
+            'max_price': None,
+            'min_area': None,
+            'max_area': None,
+            'bedrooms': None,
+            'bathrooms': None,
+            'locations': [],
+            'house_direction': None,
+            'furniture_state': None,
+            'legal_state': None
+        }
+        self.staff_suggestions = None
+        self.result_cursor = None
@@ -1,48 +1,179 @@
-import logging
-import pandas as pd
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("chatbot.log"),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
-
-
-def load_data():
-        """Load and prepare property data"""
-        try:
-            property_data = pd.read_csv("data/vietnam_housing_dataset.csv")
-            
-            # Generate descriptions
-            def generate_description(row):
-                return (
-                    f"Căn hộ tại {row['Address']}, diện tích {row['Area']}m², "
-                    f"{row['Bedrooms']} phòng ngủ, {row['Bathrooms']} phòng tắm, "
-                    f"hướng {row['House direction']}, ban công hướng {row['Balcony direction']}. "
-                    f"Nội thất: {row['Furniture state']}. "
-                    f"Pháp lý: {row['Legal status']}. "
-                    f"Mức giá: {row['Price']} tỷ VNĐ."
-                )
-            
-            property_data["description"] = property_data.apply(generate_description, axis=1)
-            
-            # Clean data
-            property_data = property_data.fillna({
-                'Bedrooms': 0, 
-                'Bathrooms': 0,
-                'House direction': 'Không xác định',
-                'Balcony direction': 'Không xác định',
-                'Furniture state': 'Không xác định',
-                'Legal status': 'Không xác định'
-            })
-            
-            logger.info(f"Loaded {len(property_data)} properties")
-        
-        except Exception as e:
-            logger.error(f"Error loading data: {e}")
-            property_data = pd.DataFrame()  # Empty dataframe as fallback
+import logging
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler("chatbot.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+DATA_PATH = "data/vietnam_housing_dataset.csv"
+
+# Gaps filled by load_data (after the descriptions are built)
+MISSING_VALUES = {
+    'Bedrooms': 0,
+    'Bathrooms': 0,
+    'House direction': 'Không xác định',
+    'Balcony direction': 'Không xác định',
+    'Furniture state': 'Không xác định',
+    'Legal status': 'Không xác định'
+}
+
+# Fields of the description, in bit order of the MISSING_COLUMN mask
+DESCRIPTION_COLUMNS = ['Address', 'Area', 'Bedrooms', 'Bathrooms', 'House direction',
+                       'Balcony direction', 'Furniture state', 'Legal status', 'Price']
+# Which description fields were missing in the CSV, before any filling
+MISSING_COLUMN = 'Missing fields'
+
+
+def _text(column):
+    """Format a column the same way an f-string formats each value"""
+    return column.astype(str)
+
+
+def build_descriptions(df):
+    """Build the listing description column with column-wise string operations"""
+    return (
+        "Căn hộ tại " + _text(df['Address']) + ", diện tích " + _text(df['Area']) + "m², "
+        + _text(df['Bedrooms']) + " phòng ngủ, " + _text(df['Bathrooms']) + " phòng tắm, "
+        + "hướng " + _text(df['House direction']) + ", ban công hướng " + _text(df['Balcony direction']) + ". "
+        + "Nội thất: " + _text(df['Furniture state']) + ". "
+        + "Pháp lý: " + _text(df['Legal status']) + ". "
+        + "Mức giá: " + _text(df['Price']) + " tỷ VNĐ."
+    )
+
+
+def build_search_text(df):
+    """Build the combined text representation used for TF-IDF search"""
+    return (
+        _text(df['Address']) + " " + _text(df['description']) + " "
+        + _text(df['House direction']) + " " + _text(df['Balcony direction']) + " "
+        + _text(df['Legal status']) + " " + _text(df['Furniture state']) + " "
+        + _text(df['Bedrooms']) + " phòng ngủ " + _text(df['Bathrooms']) + " phòng tắm "
+        + _text(df['Area']) + " m2 " + _text(df['Price']) + " tỷ"
+    )
+
+
+def missing_fields(df):
+    """Bit mask per row of the DESCRIPTION_COLUMNS that are missing"""
+    bits = np.zeros(len(df), dtype=np.uint16)
+    for bit, column in enumerate(DESCRIPTION_COLUMNS):
+        bits |= df[column].isna().to_numpy().astype(np.uint16) << bit
+    return bits
+
+
+def _missing_masks(df):
+    """column -> rows where it was missing in the CSV (empty without the mask column)"""
+    if MISSING_COLUMN not in df:
+        return {}
+    bits = df[MISSING_COLUMN].to_numpy()
+    return {column: (bits >> bit) & 1 == 1 for bit, column in enumerate(DESCRIPTION_COLUMNS)}
+
+
+def prepare_search_frame(property_data):
+    """Fill the remaining gaps and add the search_text column"""
+    # Fill NaN values to avoid issues (row labels double as row positions for the index)
+    properties = property_data.reset_index(drop=True).fillna({
+        'description': '',
+        'Address': '',
+        'Price': 0,
+        'Area': 0,
+        'Bedrooms': 0,
+        'Bathrooms': 0,
+        'House direction': 'Không có thông tin',
+        'Balcony direction': 'Không có thông tin',
+        'Legal status': 'Không có thông tin',
+        'Furniture state': 'Không có thông tin'
+    })
+
+    # Create combined text for better search
+    properties['search_text'] = build_search_text(properties)
+    return properties
+
+
+# Columns stored as pandas categoricals (dictionary-encoded) in the compact frame
+CATEGORICAL_COLUMNS = ['Address', 'House direction', 'Balcony direction', 'Legal status', 'Furniture state']
+# Summed and averaged by the statistics, so they keep full precision
+FULL_PRECISION_COLUMNS = ['Price', 'Area']
+# Counts that load_data fills with 0; the compact frame keeps them missing
+NULLABLE_COLUMNS = ['Bedrooms', 'Bathrooms']
+# Free text that is rebuilt from the other columns when needed
+DERIVED_COLUMNS = ['description', 'search_text']
+
+
+def _compact_numeric(column):
+    """Smallest integer type for integer columns, float32 for float columns"""
+    if pd.api.types.is_integer_dtype(column):
+        return pd.to_numeric(column, downcast='integer')
+    return column.astype(np.float32)
+
+
+def compact_frame(properties):
+    """Typed, memory-compact copy of a prepared property frame.
+
+    Categorical fields become pandas categoricals, and numeric fields other
+    than price and area become small integers or float32. Bedrooms and
+    bathrooms missing in the CSV go back to NaN. The description/search_text
+    strings are dropped; with_descriptions() rebuilds them, byte for byte,
+    for the rows that are shown.
+    """
+    compact = properties.drop(columns=[column for column in DERIVED_COLUMNS if column in properties])
+    missing = _missing_masks(compact)
+    for column in NULLABLE_COLUMNS:
+        if column in missing:
+            compact[column] = compact[column].mask(missing[column])
+    for column in compact.columns:
+        if column in CATEGORICAL_COLUMNS:
+            compact[column] = compact[column].astype('category')
+        elif column in FULL_PRECISION_COLUMNS or column == MISSING_COLUMN:
+            continue
+        elif pd.api.types.is_numeric_dtype(compact[column]):
+            compact[column] = _compact_numeric(compact[column])
+    return compact
+
+
+def with_descriptions(properties):
+    """properties with a description column, built only if it is missing"""
+    if 'description' in properties:
+        return properties
+    # Descriptions are built from the values as they were in the CSV, gaps included
+    raw = properties.copy()
+    for column, missing in _missing_masks(raw).items():
+        if missing.any():
+            raw[column] = raw[column].mask(missing)
+    properties = properties.copy()
+    properties['description'] = build_descriptions(raw)
+    return properties
+
+
+def search_texts(properties):
+    """search_text of every row, rebuilding descriptions if needed"""
+    if 'search_text' in properties:
+        return properties['search_text']
+    filled = with_descriptions(properties).fillna({column: MISSING_VALUES[column] for column in NULLABLE_COLUMNS})
+    return build_search_text(filled)
+
+
+def load_data(path=DATA_PATH):
+        """Load and prepare property data"""
+        try:
+            property_data = pd.read_csv(path)
+            
+            # Generate descriptions
+            property_data["description"] = build_descriptions(property_data)
+            property_data[MISSING_COLUMN] = missing_fields(property_data)
+            
+            # Clean data
+            property_data = property_data.fillna(MISSING_VALUES)
+            
+            logger.info(f"Loaded {len(property_data)} properties")
+        
+        except Exception as e:
+            logger.error(f"Error loading data: {e}")
+            property_data = pd.DataFrame()  # Empty dataframe as fallback
         return property_data
\ No newline at end of file
@@ -0,0 +1,128 @@
+import json
+import os
+import numpy as np
+
+# Small multilingual model (handles Vietnamese) that runs fine on CPU
+DEFAULT_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+
+class DenseRetriever:
+    """Semantic listing search with sentence embeddings and a quantized HNSW index.
+
+    Optional alternative to TfidfRetriever (same scores/match/top_k interface)
+    that catches paraphrases TF-IDF misses. Listings are embedded with a local
+    sentence-transformers model on CPU and stored in a FAISS HNSW graph with
+    8-bit scalar-quantized vectors, so memory stays near 1 byte per dimension
+    and queries take a few milliseconds. Row ids are listing positions; add()
+    appends new listings without rebuilding the graph.
+
+    Needs the optional packages sentence-transformers and faiss-cpu.
+    """
+
+    # Cosine similarity needed for a general inquiry to count as a match
+    threshold = 0.5
+
+    def __init__(self, model_name=DEFAULT_MODEL, index=None, hnsw_m=32, ef_search=64, search_k=200):
+        try:
+            import faiss
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "Dense retrieval needs the optional packages: pip install sentence-transformers faiss-cpu"
+            ) from e
+        self.faiss = faiss
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.hnsw_m = hnsw_m
+        self.search_k = search_k
+        self.index = index
+        if self.index is not None:
+            self.index.hnsw.efSearch = ef_search
+        self.ef_search = ef_search
+
+    def embed(self, texts, batch_size=64):
+        """L2-normalized float32 embeddings, so inner product is cosine similarity"""
+        embeddings = self.model.encode(
+            list(texts), batch_size=batch_size, normalize_embeddings=True, convert_to_numpy=True
+        )
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    def add(self, texts, batch_size=64):
+        """Embed and append listings; their row ids continue after the existing ones"""
+        embeddings = self.embed(texts, batch_size)
+        if len(embeddings) == 0:
+            return
+        if self.index is None:
+            # The scalar quantizer is trained once, on the first batch
+            self.index = self.faiss.IndexHNSWSQ(
+                embeddings.shape[1], self.faiss.ScalarQuantizer.QT_8bit,
+                self.hnsw_m, self.faiss.METRIC_INNER_PRODUCT
+            )
+            self.index.train(embeddings)
+            self.index.hnsw.efSearch = self.ef_search
+        self.index.add(embeddings)
+
+    def __len__(self):
+        return 0 if self.index is None else self.index.ntotal
+
+    @property
+    def count_limit(self):
+        """Match counts from top_k stop here: only the nearest search_k are scored"""
+        return self.search_k
+
+    def scores(self, query, candidates=None, k=None):
+        """(rows, scores) of the nearest listings to query, best first.
+
+        Approximate: only the k (default search_k) nearest are returned. A
+        candidate set restricts the graph search to those rows.
+        """
+        k = k or self.search_k
+        if self.index is None or self.index.ntotal == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        params = None
+        if candidates is not None:
+            candidates = np.asarray(candidates, dtype=np.int64)
+            if len(candidates) == 0:
+                return candidates, np.empty(0, dtype=np.float32)
+            selector = self.faiss.IDSelectorBatch(candidates)
+            params = self.faiss.SearchParametersHNSW(sel=selector, efSearch=max(self.ef_search, k))
+            k = min(k, len(candidates))
+
+        distances, labels = self.index.search(self.embed([query]), k, params=params)
+        found = labels[0] >= 0
+        return labels[0][found].astype(np.int64), distances[0][found]
+
+    def match(self, query, threshold, candidates=None):
+        """Rows among the nearest search_k whose similarity is at least threshold"""
+        rows, scores = self.scores(query, candidates)
+        return rows[scores >= threshold]
+
+    def top_k(self, query, k, threshold=0.0, candidates=None):
+        """Best k rows, plus how many of the nearest search_k passed the threshold (at most count_limit)"""
+        rows, scores = self.scores(query, candidates, k=max(k, self.search_k))
+        keep = scores >= threshold
+        rows, scores = rows[keep], scores[keep]
+        return rows[:k], scores[:k], len(rows)
+
+    def save(self, path):
+        """Write the index and its settings into directory path"""
+        os.makedirs(path, exist_ok=True)
+        self.faiss.write_index(self.index, os.path.join(path, "dense.faiss"))
+        with open(os.path.join(path, "dense.json"), "w", encoding="utf-8") as file:
+            json.dump({"model": self.model_name, "hnsw_m": self.hnsw_m, "rows": len(self)}, file)
+
+    @classmethod
+    def load(cls, path, model_name=DEFAULT_MODEL, **kwargs):
+        """Load an index saved with save(), or return None if it is missing or for another model"""
+        meta_path = os.path.join(path, "dense.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, encoding="utf-8") as file:
+            meta = json.load(file)
+        if meta.get("model") != model_name:
+            return None
+        retriever = cls(model_name, hnsw_m=meta.get("hnsw_m", 32), **kwargs)
+        retriever.index = retriever.faiss.read_index(os.path.join(path, "dense.faiss"))
+        retriever.index.hnsw.efSearch = retriever.ef_search
+        return retriever
@@ -0,0 +1,112 @@
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from docx import Document as DocxDocument
+import PyPDF2
+
+CACHE_DIR = "data/doc_cache"
+# Part of the cache key; bump when the extraction changes so cached text is redone
+PARSER_VERSION = 2
+
+
+def _extract_pdf_pages(file_path, start, end):
+    """Worker: text of pages [start, end) of a PDF"""
+    with open(file_path, "rb") as file:
+        reader = PyPDF2.PdfReader(file)
+        return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def _extract_docx(file_path):
+    """Worker: paragraphs of a Word document"""
+    doc = DocxDocument(file_path)
+    return "\n".join([para.text for para in doc.paragraphs])
+
+
+class DocumentParser:
+    """Extracts text from uploaded PDF/DOCX/TXT files off the UI thread.
+
+    PDF pages are split into ranges and extracted in a process pool, reporting
+    progress as ranges finish. Extracted text is cached on disk under the
+    SHA-256 of the file contents and PARSER_VERSION, so re-uploading the same
+    file (or opening it from another session) is a file read.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_workers=None, pages_per_task=8):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.pages_per_task = pages_per_task
+        self.pool = None
+
+    def _get_pool(self):
+        if self.pool is None:
+            # Spawned, not forked: the pool is started from a worker thread of a
+            # multithreaded process, and a forked child can inherit held locks
+            self.pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return self.pool
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    @staticmethod
+    def file_hash(file_path):
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def parse(self, file_path, progress=None):
+        """Return the text of file_path; progress(done, total) is called from this thread"""
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext not in (".txt", ".pdf", ".doc", ".docx"):
+            raise ValueError("Unsupported file type.")
+
+        cache_path = os.path.join(self.cache_dir, f"v{PARSER_VERSION}-{self.file_hash(file_path)}.txt")
+        if os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as file:
+                return file.read()
+
+        if ext == ".txt":
+            with open(file_path, "r", encoding="utf-8") as file:
+                document = file.read()
+        elif ext == ".pdf":
+            document = self._parse_pdf(file_path, progress)
+        else:
+            document = self._get_pool().submit(_extract_docx, file_path).result()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(document)
+        os.replace(tmp_path, cache_path)
+        return document
+
+    def _parse_pdf(self, file_path, progress=None):
+        with open(file_path, "rb") as file:
+            page_count = len(PyPDF2.PdfReader(file).pages)
+
+        # Short documents are not worth the process round-trip
+        if page_count <= self.pages_per_task:
+            pages = _extract_pdf_pages(file_path, 0, page_count)
+            if progress:
+                progress(page_count, page_count)
+            return "\n".join(pages)
+
+        pool = self._get_pool()
+        futures = {
+            pool.submit(_extract_pdf_pages, file_path, start, min(start + self.pages_per_task, page_count)): start
+            for start in range(0, page_count, self.pages_per_task)
+        }
+        results = {}
+        done_pages = 0
+        for future in as_completed(futures):
+            start = futures[future]
+            results[start] = future.result()
+            done_pages += len(results[start])
+            if progress:
+                progress(done_pages, page_count)
+        return "\n".join(page for start in sorted(results) for page in results[start])
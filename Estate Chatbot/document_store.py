@@ -0,0 +1,86 @@
+import re
+from functools import lru_cache
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+# Rough characters per token for mixed Vietnamese/English text
+CHARS_PER_TOKEN = 3
+
+
+def estimate_tokens(text):
+    """Cheap token estimate used for prompt budgeting"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def chunk_text(text, chunk_chars=1200, overlap=200):
+    """Split text into chunks of about chunk_chars, keeping paragraphs together"""
+    paragraphs = [p.strip() for p in re.split(r'\n\s*\n|\n', text) if p.strip()]
+    chunks = []
+    current = ""
+    for paragraph in paragraphs:
+        # Paragraphs longer than a chunk are cut into overlapping windows
+        while len(paragraph) > chunk_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:chunk_chars])
+            paragraph = paragraph[chunk_chars - overlap:]
+        if current and len(current) + len(paragraph) + 1 > chunk_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class DocumentIndex:
+    """Chunked TF-IDF index over one uploaded staff document.
+
+    Instead of the whole document, prompts get the few passages most similar
+    to the current message, capped by a token budget.
+    """
+
+    def __init__(self, text, chunk_chars=1200, overlap=200):
+        self.text = text
+        self.chunks = chunk_text(text, chunk_chars, overlap)
+        self.chunk_tokens = [estimate_tokens(chunk) for chunk in self.chunks]
+        self.total_tokens = sum(self.chunk_tokens)
+        self.vectorizer = None
+        self.chunk_vectors = None
+        if len(self.chunks) > 1:
+            self.vectorizer = TfidfVectorizer(analyzer='word', ngram_range=(1, 2), sublinear_tf=True)
+            try:
+                self.chunk_vectors = self.vectorizer.fit_transform(self.chunks)
+            except ValueError:
+                # Nothing but stop words / punctuation
+                self.vectorizer = None
+
+    def relevant_passages(self, query, token_budget=800, top_k=5):
+        """Most relevant chunks for query that fit in token_budget, in document order"""
+        if self.total_tokens <= token_budget:
+            return "\n".join(self.chunks)
+
+        if self.vectorizer is not None and query:
+            scores = (self.chunk_vectors @ self.vectorizer.transform([query]).T).toarray().ravel()
+        else:
+            scores = np.zeros(len(self.chunks))
+        # Ties (including no overlap at all) keep document order, so the opening wins
+        ranked = np.argsort(-scores, kind='stable')
+
+        selected = []
+        used = 0
+        for chunk_id in ranked[:max(top_k, 1) * 2]:
+            if len(selected) >= top_k:
+                break
+            if used + self.chunk_tokens[chunk_id] > token_budget:
+                continue
+            selected.append(chunk_id)
+            used += self.chunk_tokens[chunk_id]
+        return "\n...\n".join(self.chunks[chunk_id] for chunk_id in sorted(selected))
+
+
+@lru_cache(maxsize=32)
+def index_document(text):
+    """Chunk and index a document once; the same text is shared across sessions"""
+    return DocumentIndex(text)
@@ -0,0 +1,108 @@
+import numpy as np
+from data_prepare import with_descriptions
+
+# Reply templates; {cards} is the numbered list of listing cards
+TEMPLATES = {
+    'search': (
+        "{staff}Tôi đã tìm thấy {total} bất động sản phù hợp với yêu cầu của bạn. Dưới đây là một số gợi ý:\n\n"
+        "{cards}"
+    ),
+    'more': (
+        "Dưới đây là {count} bất động sản khác phù hợp:\n\n"
+        "{cards}"
+        "Bạn muốn xem thêm không, hay cần điều chỉnh tiêu chí tìm kiếm?"
+    ),
+    'feature_range': (
+        "Dựa trên các tiêu chí của bạn, {keyword} dao động từ {min:.2f} đến {max:.2f} {unit}, "
+        "với mức trung bình là {avg:.2f} {unit}.\n\n"
+        "Dưới đây là một số lựa chọn phù hợp:\n\n"
+        "{cards}"
+    ),
+    'feature_counts': (
+        "Dựa trên các tiêu chí của bạn, phân bố {keyword} như sau:\n\n"
+        "{distribution}"
+        "\nDưới đây là một số lựa chọn phù hợp:\n\n"
+        "{cards}"
+    ),
+    'semantic': (
+        "Dựa trên yêu cầu của bạn, tôi đã tìm thấy {total} bất động sản phù hợp. Đây là một số gợi ý hàng đầu:\n\n"
+        "{cards}"
+        "Bạn có muốn biết thêm thông tin về bất kỳ căn hộ nào trong số này không?"
+    ),
+}
+
+CARD_TEMPLATE = "{number}. {card}\n\n"
+
+# Optional parts of a card built from the columns: (column, prefix, suffix, as_int)
+CARD_PARTS = [
+    ('Area', ", diện tích ", "m²", False),
+    ('Bedrooms', ", ", " phòng ngủ", True),
+    ('Bathrooms', ", ", " phòng tắm", True),
+    ('House direction', ", hướng ", "", False),
+    ('Balcony direction', ", ban công hướng ", "", False),
+    ('Furniture state', ". Nội thất: ", "", False),
+    ('Price', ". Mức giá: ", " tỷ VNĐ", False),
+]
+
+
+def _part(column, prefix, suffix, as_int):
+    """prefix + value + suffix where the value is present, "" elsewhere"""
+    present = column.notna().to_numpy()
+    if as_int:
+        text = column.fillna(0).astype(int).astype(str)
+    else:
+        text = column.astype(str)
+    return np.where(present, prefix + text.to_numpy(dtype=object) + suffix, "")
+
+
+def build_cards(properties):
+    """Card text of every listing, built column-wise.
+
+    Listings with a description use it as is; the others get one assembled
+    from the columns that have a value.
+    """
+    cards = ("Căn hộ tại " + properties['Address'].astype(str)).to_numpy(dtype=object)
+    for column, prefix, suffix, as_int in CARD_PARTS:
+        if column in properties:
+            cards = cards + _part(properties[column], prefix, suffix, as_int)
+    cards = cards + "."
+
+    if 'description' in properties:
+        description = properties['description']
+        has_description = (description.notna() & (description.astype(str) != "")).to_numpy()
+        cards = np.where(has_description, description.astype(str).to_numpy(dtype=object), cards)
+    return cards
+
+
+class ListingRenderer:
+    """Formats result pages for every branch of _generate_response.
+
+    Cards are built column-wise for the rows of a page only (descriptions are
+    not kept in memory for the whole frame), so no branch loops over
+    DataFrame rows and all branches format listings the same way.
+    """
+
+    def __init__(self, properties, templates=None):
+        self.properties = properties
+        self.templates = dict(TEMPLATES, **(templates or {}))
+
+    def card_list(self, rows):
+        """Card strings for the given row positions (for export or web clients)"""
+        page = self.properties.iloc[np.asarray(rows, dtype=np.int64)]
+        return build_cards(with_descriptions(page)).tolist()
+
+    def render_cards(self, rows, start=1):
+        """Numbered cards for the given row positions"""
+        return "".join(
+            CARD_TEMPLATE.format(number=number, card=card)
+            for number, card in enumerate(self.card_list(rows), start)
+        )
+
+    def render(self, template, rows, start=1, **context):
+        """Fill a named template with the cards of rows and the given values"""
+        return self.templates[template].format(cards=self.render_cards(rows, start), **context)
+
+    @staticmethod
+    def distribution(counts):
+        """"- value: count căn" lines for a value_counts() result"""
+        return "".join(f"- {value}: {count} căn\n" for value, count in counts.items() if count)
@@ -0,0 +1,224 @@
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import httpx
+import openai
+from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://openrouter.ai/api/v1"
+DEFAULT_MODEL = "openai/gpt-4.1-mini"
+
+# Errors worth another attempt (same model after a backoff, then the fallbacks)
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class LLMUnavailableError(RuntimeError):
+    """No model answered within the deadline"""
+
+
+class CircuitBreaker:
+    """Skips a model for `cooldown` seconds after `failures` consecutive errors"""
+
+    def __init__(self, failures=5, cooldown=30):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.errors = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            # Half-open: let one call through once the cooldown is over
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                self.opened_at = None
+                self.errors = self.failures - 1
+                return True
+            return False
+
+    def record(self, ok):
+        with self.lock:
+            if ok:
+                self.errors = 0
+                self.opened_at = None
+            else:
+                self.errors += 1
+                if self.errors >= self.failures:
+                    self.opened_at = time.monotonic()
+
+
+class LLMGateway:
+    """Shared chat-completion client for every chatbot session.
+
+    - one pooled keep-alive HTTP client (max_connections sockets)
+    - every call has a deadline; attempts get the time that is left
+    - at most max_concurrency calls in flight; the rest wait for a slot
+    - retryable errors are retried with jittered exponential backoff,
+      then the next model in `models` is tried
+    - a model that keeps failing is skipped for a while (circuit breaker)
+    - with hedge_after set, a non-streaming call that has not answered after
+      that many seconds is sent a second time and the first answer wins,
+      provided a concurrency slot is free
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, api_key=None, models=(DEFAULT_MODEL,),
+                 timeout=30.0, connect_timeout=5.0, max_concurrency=16, max_connections=32,
+                 max_retries=2, backoff=0.5, hedge_after=None):
+        self.models = list(models)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.breakers = {model: CircuitBreaker() for model in self.models}
+        self.http_client = httpx.Client(
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        # Retries are done here, across models, not inside the SDK
+        self.client = OpenAI(base_url=base_url, api_key=api_key, http_client=self.http_client, max_retries=0)
+        self.hedge_pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm-hedge")
+
+    def close(self):
+        self.hedge_pool.shutdown(wait=False, cancel_futures=True)
+        self.http_client.close()
+
+    def _acquire(self, deadline, blocking=True):
+        remaining = deadline - time.monotonic()
+        if not blocking:
+            return self.slots.acquire(blocking=False)
+        return remaining > 0 and self.slots.acquire(timeout=remaining)
+
+    def _attempts(self, deadline):
+        """Yield (model, attempt) pairs in retry order, sleeping between retries"""
+        for model in self.models:
+            if not self.breakers[model].allow():
+                logger.warning(f"Skipping {model}: circuit open")
+                continue
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    # Full jitter: anywhere up to the exponential backoff
+                    delay = random.uniform(0, self.backoff * 2 ** (attempt - 1))
+                    if time.monotonic() + delay >= deadline:
+                        return
+                    time.sleep(delay)
+                if time.monotonic() >= deadline:
+                    return
+                yield model, attempt
+
+    def _create(self, model, messages, deadline, **kwargs):
+        """One request holding a concurrency slot; returns the completion text"""
+        timeout = min(self.timeout, deadline - time.monotonic())
+        response = self.client.chat.completions.create(
+            model=model, messages=messages, timeout=timeout, **kwargs
+        )
+        return response.choices[0].message.content.strip()
+
+    def _create_released(self, model, messages, deadline, **kwargs):
+        try:
+            return self._create(model, messages, deadline, **kwargs)
+        finally:
+            self.slots.release()
+
+    def _hedged(self, model, messages, deadline, **kwargs):
+        """Run the request, duplicating it if it is slower than hedge_after"""
+        futures = [self.hedge_pool.submit(self._create_released, model, messages, deadline, **kwargs)]
+        done, _ = wait(futures, timeout=self.hedge_after)
+        if not done and self._acquire(deadline, blocking=False):
+            logger.info(f"Hedging slow request to {model}")
+            futures.append(self.hedge_pool.submit(self._create_released, model, messages, deadline, **kwargs))
+
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                raise LLMUnavailableError(f"{model} did not answer before the deadline")
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def complete(self, messages, max_tokens=500, temperature=0.2, deadline=None):
+        """Completion text for messages; raises LLMUnavailableError when every attempt fails"""
+        deadline = time.monotonic() + (deadline or self.timeout * 2)
+        last_error = None
+        for model, attempt in self._attempts(deadline):
+            if not self._acquire(deadline):
+                break
+            try:
+                if self.hedge_after:
+                    text = self._hedged(model, messages, deadline, max_tokens=max_tokens, temperature=temperature)
+                else:
+                    text = self._create_released(model, messages, deadline,
+                                                 max_tokens=max_tokens, temperature=temperature)
+            except RETRYABLE_ERRORS as e:
+                logger.warning(f"{model} attempt {attempt + 1} failed: {e}")
+                self.breakers[model].record(False)
+                last_error = e
+                continue
+            self.breakers[model].record(True)
+            return text
+        raise LLMUnavailableError(f"No model answered in time: {last_error}")
+
+    def stream(self, messages, max_tokens=500, temperature=0.2, deadline=None):
+        """Yield completion text as it arrives.
+
+        Retries and fallbacks only happen before the first token; after that
+        an error is raised to the caller, who already showed part of the reply.
+        """
+        deadline = time.monotonic() + (deadline or self.timeout * 2)
+        last_error = None
+        for model, attempt in self._attempts(deadline):
+            if not self._acquire(deadline):
+                break
+            started = False
+            try:
+                stream = self.client.chat.completions.create(
+                    model=model, messages=messages, max_tokens=max_tokens, temperature=temperature,
+                    stream=True, timeout=min(self.timeout, deadline - time.monotonic()),
+                )
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        started = True
+                        yield chunk.choices[0].delta.content
+            except RETRYABLE_ERRORS as e:
+                self.breakers[model].record(False)
+                if started:
+                    raise
+                logger.warning(f"{model} stream attempt {attempt + 1} failed: {e}")
+                last_error = e
+                continue
+            finally:
+                self.slots.release()
+            self.breakers[model].record(True)
+            return
+        raise LLMUnavailableError(f"No model answered in time: {last_error}")
+
+
+def gateway_from_env(**kwargs):
+    """Gateway configured from LLM_* environment variables (defaults: OpenRouter)"""
+    fallbacks = [model.strip() for model in os.environ.get("LLM_FALLBACK_MODELS", "openai/gpt-4o-mini").split(",")]
+    settings = dict(
+        base_url=os.environ.get("LLM_BASE_URL", DEFAULT_BASE_URL),
+        api_key=os.environ.get("OPENROUTER_API_KEY"),
+        models=[os.environ.get("LLM_MODEL", DEFAULT_MODEL)] + [model for model in fallbacks if model],
+        timeout=float(os.environ.get("LLM_TIMEOUT", 30)),
+        max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", 16)),
+    )
+    if os.environ.get("LLM_HEDGE_AFTER"):
+        settings["hedge_after"] = float(os.environ["LLM_HEDGE_AFTER"])
+    settings.update(kwargs)
+    return LLMGateway(**settings)
@@ -0,0 +1,147 @@
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = "Đây là câu trả lời thử nghiệm."
+
+
+class StubLLMServer:
+    """Local OpenAI-compatible chat-completions server for tests and load runs.
+
+    Answers POST .../chat/completions with a fixed reply after `latency`
+    seconds (plus up to `jitter` more), failing a `fail_rate` share of
+    requests with HTTP 503, and streams the reply word by word when asked.
+    latencies, if given, sets the latency of the first requests in order
+    (e.g. a slow first request for hedging tests).
+    Point the gateway at it with LLMGateway(base_url=server.base_url):
+
+        with StubLLMServer(latency=0.2, fail_rate=0.1) as server:
+            gateway = LLMGateway(base_url=server.base_url, api_key="test")
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, reply=DEFAULT_REPLY, latency=0.0, jitter=0.0, fail_rate=0.0,
+                 latencies=None):
+        self.reply = reply
+        self.latency = latency
+        self.latencies = list(latencies or [])
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "Not found"}})
+                    return
+                with stub.lock:
+                    number = stub.requests
+                    stub.requests += 1
+
+                latency = stub.latencies[number] if number < len(stub.latencies) else stub.latency
+                time.sleep(latency + random.uniform(0, stub.jitter))
+                if random.random() < stub.fail_rate:
+                    self._send_json(503, {"error": {"message": "Stub failure", "type": "server_error"}})
+                    return
+
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+                model = request.get("model", "stub")
+                if not request.get("stream"):
+                    self._send_json(200, {
+                        "id": completion_id,
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": stub.reply},
+                            "finish_reason": "stop",
+                        }],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                    })
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                words = stub.reply.split(" ")
+                for i, word in enumerate(words):
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "delta": {"content": word if i == 0 else " " + word},
+                            "finish_reason": "stop" if i == len(words) - 1 else None,
+                        }],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub for the chat-completions API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--reply", default=DEFAULT_REPLY)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before answering")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with HTTP 503")
+    args = parser.parse_args()
+
+    server = StubLLMServer(args.host, args.port, args.reply, args.latency, args.jitter, args.fail_rate)
+    print(f"Stub LLM listening on {server.base_url}")
+    server.httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import re
+import unicodedata
+from property_index import normalize_text
+
+# Words that carry no preference by themselves ("tìm căn hộ ở ...")
+FILLER_WORDS = {
+    'tôi', 'mình', 'em', 'cần', 'muốn', 'tìm', 'kiếm', 'mua', 'thuê', 'cho', 'xem', 'giúp',
+    'nhà', 'căn', 'hộ', 'chung', 'cư', 'biệt', 'thự', 'đất', 'phố', 'ở', 'tại', 'khu', 'vực',
+    'có', 'và', 'với', 'hoặc', 'hay', 'giá', 'diện', 'tích', 'rộng', 'loại', 'một', 'cái',
+    'ạ', 'nhé', 'nha', 'đi', 'thì', 'được', 'quận', 'huyện', 'phường', 'xã',
+}
+
+# Anything that needs the model: questions, personal info, inferences
+QUESTION_PATTERN = re.compile(
+    r'\?|\b(là gì|gì|sao|thế nào|bao nhiêu|không|có nên|tư vấn|giải thích|nghĩa)\b'
+)
+PERSONAL_PATTERN = re.compile(
+    r'\b(tên|tuổi|vợ|chồng|con|người|gia đình|anh|chị|nam|nữ|thu nhập|lương|phút|km|gần|cách|làm việc|đi làm|trường)\b'
+)
+
+NUMBER = r'(\d+(?:[.,]\d+)?)'
+MAX_WORDS = r'dưới|tối đa|không quá|ít hơn|nhỏ hơn|max|<=?'
+MIN_WORDS = r'trên|từ|tối thiểu|ít nhất|hơn|lớn hơn|min|>=?'
+APPROX_WORDS = r'khoảng|tầm|cỡ|chừng|~'
+
+# One capturing group each; "5 tỷ 5" keeps the trailing digits in the unit
+PRICE_UNIT = r'((?:tỷ|tỉ|ty|triệu|tr)\b(?:\s*\d{1,3}\b(?!\s*(?:m|mét|phòng|pn|wc)))?)'
+AREA_UNIT = r'((?:m2|m²|mét vuông|m vuông|m)(?!\w))'
+
+DIRECTIONS = {
+    'đông nam': 'Đông - Nam', 'đông bắc': 'Đông - Bắc', 'tây nam': 'Tây - Nam', 'tây bắc': 'Tây - Bắc',
+    'đông': 'Đông', 'tây': 'Tây', 'nam': 'Nam', 'bắc': 'Bắc',
+}
+DIRECTION_PATTERN = re.compile(r'hướng\s+(đông|tây|nam|bắc)(?:\s*-?\s*(nam|bắc))?')
+
+RULES = [
+    ('bathrooms', re.compile(r'(\d+)\s*(?:wc|toilet|phòng tắm|nhà tắm|phòng vệ sinh|nhà vệ sinh|vệ sinh)')),
+    ('bedrooms', re.compile(r'(\d+)\s*(?:phòng ngủ|pn|ngủ|phòng(?!\s*(?:khách|bếp|tắm|vệ sinh|wc)))')),
+    ('legal_state', re.compile(r'(?:có\s*)?sổ\s*(?:đỏ|hồng|riêng|chung)|có sổ|pháp lý\s*(?:đầy đủ|rõ ràng)')),
+    ('sale_contract', re.compile(r'hợp đồng mua bán')),
+    ('furniture_full', re.compile(r'(?:full|đầy đủ)\s*nội thất|nội thất\s*(?:đầy đủ|full)')),
+    ('furniture_basic', re.compile(r'nội thất\s*cơ bản')),
+]
+
+# Address parts that are streets, projects or house numbers rather than areas
+SKIP_PREFIXES = ('dự án', 'đường', 'phố', 'ngõ', 'hẻm', 'số', 'bán', 'khu')
+AREA_PREFIXES = ('phường ', 'xã ', 'huyện ', 'thị xã ', 'thị trấn ', 'tỉnh ', 'thành phố ', 'tp ')
+
+
+def _normalize(text):
+    text = unicodedata.normalize('NFC', text or '').lower()
+    # "q7", "q.7" -> "quận 7"
+    text = re.sub(r'\bq\.?\s*(\d+)\b', r'quận \1', text)
+    return text
+
+
+def _key(location):
+    """Gazetteer key: the words of a location, normalized and tokenized like a message"""
+    return ' '.join(re.findall(r'\w+', _normalize(normalize_text(location))))
+
+
+def _to_number(value):
+    return float(value.replace(',', '.'))
+
+
+def _price(number, unit):
+    """Amount in billion VND; "5 tỷ 5" is 5.5"""
+    value = _to_number(number)
+    unit, _, decimal = unit.partition(' ')
+    if unit in ('triệu', 'tr'):
+        return value / 1000
+    if decimal.strip():
+        value += int(decimal) / 10 ** len(decimal.strip())
+    return value
+
+
+def _area(number, unit):
+    return _to_number(number)
+
+
+class PreferenceExtractor:
+    """Rule-based extraction of simple search preferences.
+
+    Handles messages such as "3 phòng ngủ, dưới 5 tỷ, Cầu Giấy" with regexes
+    for prices, areas, rooms, direction, legal and furniture state, and a
+    gazetteer of district/ward names taken from the listing addresses. The
+    confidence is the share of the message's words explained by the rules;
+    questions and personal details always score 0 so they go to the model.
+    """
+
+    # Confidence needed to skip the model
+    threshold = 0.8
+
+    def __init__(self, locations, max_words=5):
+        # Normalized name -> location as written in the data
+        self.gazetteer = {}
+        aliases = {}
+        for location in locations:
+            location = location.strip(' .')
+            # Addresses with doubled or stray spaces still give single-spaced keys
+            key = _key(location)
+            words = key.split()
+            if not 2 <= len(words) <= max_words or key.startswith(SKIP_PREFIXES):
+                continue
+            if re.search(r'\d', key) and not re.fullmatch(r'quận \d+', key):
+                continue
+            self.gazetteer[key] = location
+            # "Phường Dịch Vọng" is also found as "dịch vọng"; the address lookup matches it as a phrase
+            for prefix in AREA_PREFIXES:
+                prefix_words = len(prefix.split())
+                if key.startswith(prefix) and len(words) - prefix_words >= 2:
+                    aliases.setdefault(' '.join(words[prefix_words:]), location.split(None, prefix_words)[-1])
+        for key, location in aliases.items():
+            self.gazetteer.setdefault(key, location)
+        self.max_words = max(len(key.split()) for key in self.gazetteer) if self.gazetteer else 0
+
+    def extract(self, message):
+        """Return (preferences, confidence) for message"""
+        text = _normalize(message)
+        preferences = {}
+        spans = []
+
+        def consume(match):
+            spans.append(match.span())
+
+        # Prices and areas: ranges first, then single values with a qualifier
+        for key, unit, convert, default in (
+            ('price', PRICE_UNIT, _price, 'max'),
+            ('area', AREA_UNIT, _area, 'min'),
+        ):
+            extracted = self._amounts(text, unit, convert, default, consume)
+            if extracted:
+                low, high = extracted
+                # Only the bounds that were stated; "dưới 5 tỷ" keeps an earlier minimum
+                if low is not None:
+                    preferences[f'min_{key}'] = low
+                if high is not None:
+                    preferences[f'max_{key}'] = high
+
+        for key, pattern in RULES:
+            match = pattern.search(text)
+            if not match:
+                continue
+            consume(match)
+            if key in ('bedrooms', 'bathrooms'):
+                preferences[key] = int(match.group(1))
+            elif key == 'legal_state':
+                preferences['legal_state'] = 'Have Certificate'
+            elif key == 'sale_contract':
+                preferences['legal_state'] = 'Sale contract'
+            elif key == 'furniture_full':
+                preferences['furniture_state'] = 'Full'
+            elif key == 'furniture_basic':
+                preferences['furniture_state'] = 'Basic'
+
+        match = DIRECTION_PATTERN.search(text)
+        if match:
+            consume(match)
+            direction = ' '.join(part for part in match.groups() if part)
+            preferences['house_direction'] = DIRECTIONS.get(direction, DIRECTIONS[match.group(1)])
+
+        locations = self._locations(text, spans)
+        if locations:
+            preferences['locations'] = locations
+
+        if not preferences:
+            return preferences, 0.0
+
+        # Whatever the rules did not explain decides the confidence
+        remainder = text
+        for start, end in sorted(spans, reverse=True):
+            remainder = remainder[:start] + ' ' + remainder[end:]
+        if QUESTION_PATTERN.search(remainder) or PERSONAL_PATTERN.search(remainder):
+            return preferences, 0.0
+        words = re.findall(r'\w+', text)
+        unexplained = [word for word in re.findall(r'\w+', remainder) if word not in FILLER_WORDS]
+        return preferences, 1.0 - len(unexplained) / len(words)
+
+    def _amounts(self, text, unit, convert, default, consume):
+        """(low, high) for the first amount with the given unit, or None"""
+        range_pattern = re.compile(
+            rf'(?:từ\s*)?{NUMBER}\s*(?:{unit})?\s*(?:-|–|đến|tới|~)\s*{NUMBER}\s*{unit}'
+        )
+        match = range_pattern.search(text)
+        if match:
+            consume(match)
+            low_number, low_unit, high_number, high_unit = match.groups()
+            # "3-5 tỷ": the first amount takes the unit of the second
+            low = convert(low_number, low_unit or high_unit)
+            high = convert(high_number, high_unit)
+            return min(low, high), max(low, high)
+
+        single_pattern = re.compile(
+            rf'(?:({MAX_WORDS}|{MIN_WORDS}|{APPROX_WORDS})\s*)?{NUMBER}\s*{unit}'
+            rf'(?:\s*(đổ lại|trở xuống|trở lên|trở lại))?'
+        )
+        match = single_pattern.search(text)
+        if not match:
+            return None
+        consume(match)
+        qualifier, number, unit_text, suffix = match.groups()
+        value = convert(number, unit_text)
+
+        if suffix in ('đổ lại', 'trở xuống', 'trở lại') or (qualifier and re.fullmatch(MAX_WORDS, qualifier)):
+            return None, value
+        if suffix == 'trở lên' or (qualifier and re.fullmatch(MIN_WORDS, qualifier)):
+            return value, None
+        if qualifier:
+            return round(value * 0.9, 3), round(value * 1.1, 3)
+        return (None, value) if default == 'max' else (value, None)
+
+    def _locations(self, text, spans):
+        """Gazetteer names in text (longest match first), as written in the data"""
+        words = list(re.finditer(r'\w+', text))
+        taken = [any(start <= word.start() < end for start, end in spans) for word in words]
+        found = []
+        i = 0
+        while i < len(words):
+            for size in range(min(self.max_words, len(words) - i), 1, -1):
+                if any(taken[i:i + size]):
+                    continue
+                key = ' '.join(word.group() for word in words[i:i + size])
+                location = self.gazetteer.get(key)
+                if location is None:
+                    continue
+                if location not in found:
+                    found.append(location)
+                spans.append((words[i].start(), words[i + size - 1].end()))
+                i += size - 1
+                break
+            i += 1
+        return found
@@ -0,0 +1,195 @@
+import json
+import threading
+from document_store import estimate_tokens
+
+# Static part of the extraction prompt. It never changes between turns, so it
+# is sent first (system message) where provider-side prompt caching can reuse it.
+EXTRACTION_INSTRUCTIONS = """You are an AI assistant helping to extract real estate preferences, user personal info and answering real estate questions.
+
+Your tasks:
+1. Extracting and updating their real estate preferences and personal information
+2. Answering questions about real estate concepts in a clear, concise, and friendly way
+
+The user message comes with the current extracted preferences and user information (only the fields already known) and, when there is one, the relevant part of a document written by staff. Read the document; responding must follow the document.
+
+Please follow the logic below depending on the user's message:
+
+---
+
+**Case 1: If the message is a real estate question**
+(e.g., "mét vuông là gì", "lộ giới là gì", "sổ hồng là sao?", etc.)
+
+Respond with a short and clear explanation in Vietnamese.
+Do **not** return JSON.
+Keep it conversational and helpful.
+
+---
+
+**Case 2: If the message provides user preferences or personal information**
+
+Extract the data and return it wrapped in this format:
+If user not mentioned any keyword in: tìm, nhà, căn hộ, biệt thự, đất, etc. Just return ONE JSON block about user information only.
+<json>
+{
+    "user_preferences": {
+        "min_price": float or null (in **billion VND**),
+        "max_price": float or null (in **billion VND**),
+        "min_area": float or null (in m²),
+        "max_area": float or null (in m²),
+        "bedrooms": int or null,
+        "bathrooms": int or null,
+        "locations": list of strings,
+        "house_direction": string or null,
+        "legal_state": string or null, (if user mentioned "sổ đỏ", "sổ hồng", "sổ chung", "sổ riêng", etc. return Have Certificate)
+        "furniture_state": string or null
+    },
+    "user_information": {
+        "name": str or null,
+        "age": int or null,
+        "gender": str or null,
+        "income_level": str or null,
+        "budget": str or null,
+        "owned_assets": str or null,
+        "hobbies": str or null,
+        "preferred_brands": str or null,
+        "family_info": str or null,
+    }
+}
+</json>
+Keep the preferences that are already known unless the message changes them.
+
+---
+
+If a user describes estimated travel time from a landmark (e.g. "cách quận Đống Đa khoảng 30 phút đi xe"), infer nearby districts or areas and populate the `locations` list accordingly.
+
+If user mentions family size (e.g., "2 vợ chồng và 2 con"), you may infer:
+- min_area, bedrooms, bathrooms based on this mapping:
+    - 1–2 people: min_area = 30, bedrooms = 1, bathrooms = 1
+    - 3–4 people: min_area = 50, bedrooms = 2, bathrooms = 1
+    - 5–6 people: min_area = 70, bedrooms = 3, bathrooms = 3
+    - >6 people: min_area = 90, bedrooms = 4, bathrooms = 4
+"""
+
+# Structured-output mode: the personalized opening comes back in the same completion
+REPLY_INSTRUCTIONS = """
+Also add a "reply" field next to "user_preferences" in the JSON block:
+a short opening sentence in Vietnamese, personalized to the user information, that introduces the listings we are about to show.
+If user mentioned keyword: nữ, the reply must start with Chào chị.
+If user mentioned keyword: nam, the reply must start with Chào anh.
+Keep the reply gentle and friendly.
+"""
+
+
+def _count_tokens_estimate(text):
+    return estimate_tokens(text)
+
+
+def default_token_counter():
+    """tiktoken when it is installed, otherwise the character-based estimate"""
+    try:
+        import tiktoken
+    except ImportError:
+        return _count_tokens_estimate
+    encoding = tiktoken.get_encoding("o200k_base")
+    return lambda text: len(encoding.encode(text))
+
+
+def _known(values, skip=()):
+    """Only the fields that are set, as compact JSON"""
+    known = {key: value for key, value in (values or {}).items()
+             if key not in skip and value not in (None, "", [], {})}
+    return json.dumps(known, ensure_ascii=False, separators=(",", ":"))
+
+
+class PromptBuilder:
+    """Builds the extraction prompt within a token budget and counts its tokens.
+
+    The instructions are a fixed system message; the user message only holds
+    what changes per turn: the known preference and profile fields (unset
+    fields are left out), the relevant staff-document passages and the user's
+    message. When the total would exceed token_budget, the document passages
+    are shrunk first, then the profile is dropped, then the message is cut.
+    Token counts are kept in `stats` for monitoring.
+
+    Every turn sends all known fields, not only the ones that changed: the
+    model returns the full preference block and _apply_preferences takes it
+    as is, so fields left out of the prompt would come back empty.
+    """
+
+    def __init__(self, token_budget=2500, document_token_budget=800, count_tokens=None):
+        self.token_budget = token_budget
+        self.document_token_budget = document_token_budget
+        self.count_tokens = count_tokens or default_token_counter()
+        self.static_tokens = {
+            False: self.count_tokens(EXTRACTION_INSTRUCTIONS),
+            True: self.count_tokens(EXTRACTION_INSTRUCTIONS + REPLY_INSTRUCTIONS),
+        }
+        self.lock = threading.Lock()
+        self.stats = {
+            "prompts": 0,
+            "prompt_tokens": 0,
+            "static_tokens": 0,
+            "last_prompt_tokens": 0,
+            "max_prompt_tokens": 0,
+            "truncated": 0,
+        }
+
+    def extraction_messages(self, message, preferences, user_information, document=None, with_reply=False):
+        """Chat messages for one extraction call.
+
+        document is a callable taking a token budget and returning the relevant
+        passages (or None when there is no staff document).
+        """
+        system = EXTRACTION_INSTRUCTIONS + (REPLY_INSTRUCTIONS if with_reply else "")
+        static_tokens = self.static_tokens[with_reply]
+        state = f"Current extracted preferences: {_known(preferences, skip=('user_id',))}\n"
+        profile = f"Current user information: {_known(user_information)}\n"
+        request = f'Below is the user message:\n"{message}"'
+
+        available = self.token_budget - static_tokens
+        fixed_tokens = self.count_tokens(state) + self.count_tokens(request)
+        truncated = False
+
+        # Drop the profile only when it does not fit next to the state and message even with no document
+        profile_tokens = self.count_tokens(profile)
+        if fixed_tokens + profile_tokens > available:
+            profile, profile_tokens, truncated = "", 0, True
+
+        passages = ""
+        document_budget = min(self.document_token_budget, available - fixed_tokens - profile_tokens)
+        if document is not None and document_budget > 0:
+            text = document(document_budget)
+            if text:
+                passages = f"Staff document:\n{text}\n"
+                if document_budget < self.document_token_budget:
+                    truncated = True
+
+        if fixed_tokens > available:
+            # Only a huge message gets here; keep its beginning
+            state_tokens = self.count_tokens(state)
+            keep_chars = max(available - state_tokens, 0) * len(message) // max(self.count_tokens(message), 1)
+            request = f'Below is the user message:\n"{message[:keep_chars]}"'
+            truncated = True
+
+        user = state + profile + passages + "\n" + request
+        self._record(static_tokens, static_tokens + self.count_tokens(user), truncated)
+        return [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user},
+        ]
+
+    def _record(self, static_tokens, tokens, truncated):
+        with self.lock:
+            self.stats["prompts"] += 1
+            self.stats["prompt_tokens"] += tokens
+            self.stats["static_tokens"] += static_tokens
+            self.stats["last_prompt_tokens"] = tokens
+            self.stats["max_prompt_tokens"] = max(self.stats["max_prompt_tokens"], tokens)
+            self.stats["truncated"] += int(truncated)
+
+    def metrics(self):
+        """Snapshot of the token counters, plus the average prompt size"""
+        with self.lock:
+            stats = dict(self.stats)
+        stats["avg_prompt_tokens"] = stats["prompt_tokens"] / stats["prompts"] if stats["prompts"] else 0
+        return stats
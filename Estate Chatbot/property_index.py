@@ -0,0 +1,198 @@
+import re
+import numpy as np
+import pandas as pd
+
+
+def normalize_text(text):
+    """Lowercase and trim a location string for matching"""
+    return (
+        text.lower()
+        .replace("quận", "quận") # handle weird accents
+        .strip()
+    )
+
+
+class PropertyIndex:
+    """Read-only column index over the property frame, built once at startup.
+
+    Numeric columns are stored as sorted arrays so range filters are answered
+    with two binary searches. Categorical columns are stored as integer codes
+    so a filter is evaluated once per distinct value instead of once per row.
+    Every query returns a boolean mask over the row positions of the frame.
+    """
+
+    NUMERIC_COLUMNS = ['Price', 'Area', 'Bedrooms', 'Bathrooms']
+    CATEGORICAL_COLUMNS = ['House direction', 'Furniture state', 'Legal status']
+
+    def __init__(self, properties):
+        self.size = len(properties)
+
+        # Numeric columns: row ids sorted by value (NaN rows sort to the end)
+        self.sorted_rows = {}
+        self.sorted_values = {}
+        self.valid_counts = {}
+        for column in self.NUMERIC_COLUMNS:
+            values = pd.to_numeric(properties[column], errors='coerce').to_numpy()
+            # float32 columns stay float32 (bounds are cast to match); the rest become float64
+            if values.dtype != np.float32:
+                values = values.astype(np.float64)
+            order = np.argsort(values, kind='stable')
+            self.sorted_rows[column] = order
+            self.sorted_values[column] = values[order]
+            self.valid_counts[column] = int(np.count_nonzero(~np.isnan(values)))
+
+        # Categorical columns: one code per row plus the table of distinct values
+        self.codes = {}
+        self.categories = {}
+        for column in self.CATEGORICAL_COLUMNS:
+            codes, categories = pd.factorize(properties[column].astype(str))
+            self.codes[column] = codes.astype(np.int32)
+            self.categories[column] = list(categories)
+
+    def all_rows(self):
+        """Mask selecting every row"""
+        return np.ones(self.size, dtype=bool)
+
+    def rows_mask(self, rows):
+        """Mask selecting the given row positions"""
+        mask = np.zeros(self.size, dtype=bool)
+        mask[np.asarray(rows, dtype=np.int64)] = True
+        return mask
+
+    def range_mask(self, column, low=None, high=None):
+        """Rows where low <= column <= high (either bound may be None)"""
+        values = self.sorted_values[column]
+        # Compare in the column's precision, so 8.6 matches a float32 8.6
+        start = 0 if low is None else np.searchsorted(values, values.dtype.type(low), side='left')
+        end = self.valid_counts[column] if high is None else np.searchsorted(values, values.dtype.type(high), side='right')
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.sorted_rows[column][start:end]] = True
+        return mask
+
+    def category_mask(self, column, predicate):
+        """Rows whose value satisfies predicate, evaluated once per distinct value"""
+        categories = self.categories[column]
+        matching = np.fromiter((predicate(value) for value in categories), dtype=bool, count=len(categories))
+        if not matching.any():
+            return np.zeros(self.size, dtype=bool)
+        return matching[self.codes[column]]
+
+
+class AddressIndex:
+    """Inverted index from normalized address components to row positions.
+
+    Addresses are split on commas once at load time (ward, district, province,
+    project name). Each distinct component keeps the rows it appears in, and a
+    word index over the components narrows a query to the few components that
+    can contain it, so a location lookup never scans the rows. A query with a
+    comma ("Cầu Giấy, Hà Nội") spans components and is checked against the
+    full addresses of the rows that have all its words.
+    """
+
+    def __init__(self, addresses):
+        self.size = len(addresses)
+        self.addresses = addresses
+        self.locations = set()
+        self.components = []
+        component_ids = {}
+        component_rows = []
+
+        for row, address in enumerate(addresses):
+            for part in str(address).split(','):
+                part = part.strip()
+                self.locations.add(part)
+                key = normalize_text(part)
+                component_id = component_ids.get(key)
+                if component_id is None:
+                    component_id = len(self.components)
+                    component_ids[key] = component_id
+                    self.components.append(key)
+                    component_rows.append([])
+                component_rows[component_id].append(row)
+
+        self.component_ids = component_ids
+        self.component_rows = [np.asarray(rows, dtype=np.int32) for rows in component_rows]
+
+        # Word -> ids of the components containing it
+        self.word_components = {}
+        for component_id, key in enumerate(self.components):
+            for word in set(re.findall(r'\w+', key)):
+                self.word_components.setdefault(word, set()).add(component_id)
+
+    def _match_components(self, query):
+        """Ids of the components containing query as a whole-word phrase"""
+        matches = set()
+        component_id = self.component_ids.get(query)
+        if component_id is not None:
+            matches.add(component_id)
+
+        # Longer components can contain it too ("hà nội." or a street named after the district)
+        words = re.findall(r'\w+', query)
+        if words:
+            candidates = set.intersection(*(self.word_components.get(word, set()) for word in words))
+            pattern = re.compile(rf'\b{re.escape(query)}\b')
+            matches.update(component_id for component_id in candidates
+                           if pattern.search(self.components[component_id]))
+        return matches
+
+    def _word_rows(self, word):
+        """Mask of the rows with word in any address component"""
+        mask = np.zeros(self.size, dtype=bool)
+        for component_id in self.word_components.get(word, ()):
+            mask[self.component_rows[component_id]] = True
+        return mask
+
+    def lookup(self, location):
+        """Rows whose address contains location as a whole-word phrase"""
+        query = normalize_text(location)
+        if not query:
+            return np.zeros(self.size, dtype=bool)
+        if ',' not in query:
+            mask = np.zeros(self.size, dtype=bool)
+            for component_id in self._match_components(query):
+                mask[self.component_rows[component_id]] = True
+            return mask
+
+        # Spans components: narrow to rows having every word, then match the full addresses
+        words = set(re.findall(r'\w+', query))
+        mask = np.full(self.size, bool(words))
+        for word in words:
+            mask &= self._word_rows(word)
+        rows = np.flatnonzero(mask)
+        pattern = re.compile(rf'\b{re.escape(query)}\b')
+        found = [pattern.search(normalize_text(str(address))) is not None for address in self.addresses.iloc[rows]]
+        mask[rows[~np.asarray(found, dtype=bool)]] = False
+        return mask
+
+    def lookup_any(self, locations):
+        """Rows whose address matches at least one of the locations"""
+        mask = np.zeros(self.size, dtype=bool)
+        for location in locations:
+            mask |= self.lookup(location)
+        return mask
+
+
+class ResultCursor:
+    """Ranked row ids of one search, paged through without re-filtering.
+
+    The order is fixed when the search runs (seeded shuffle), so repeated
+    "show more" requests never repeat or skip a listing.
+    """
+
+    def __init__(self, rows, seed=None):
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.seed = seed
+        self.position = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def remaining(self):
+        return len(self.rows) - self.position
+
+    def next_page(self, count):
+        """Row ids of the next count results; advances the cursor"""
+        page = self.rows[self.position:self.position + count]
+        self.position += len(page)
+        return page
@@ -0,0 +1,143 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RequestExecutor:
+    """Runs slow chatbot calls off the Tk thread and hands results back to it.
+
+    Work is submitted to a thread pool and returns a future. Finished futures
+    are queued by the worker and drained on the Tk thread through master.after,
+    so callbacks may touch widgets. The queue is only polled while requests are
+    pending. Cancelled requests never reach their callbacks, including ones that
+    were already running when they were cancelled.
+
+    submit_stream runs a generator instead and hands each chunk to on_chunk on
+    the Tk thread as it is produced, so replies can be painted incrementally.
+    """
+
+    def __init__(self, master, max_workers=1, poll_ms=50, on_change=None):
+        self.master = master
+        # One worker by default so a conversation is answered in order
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chatbot")
+        self.poll_ms = poll_ms
+        self.on_change = on_change
+        self.done = queue.Queue()
+        self.pending = {}
+        # future -> (chunk queue, on_chunk, stop event) for streaming requests
+        self.streams = {}
+        self.discarded = set()
+        self.polling = False
+
+    @property
+    def busy(self):
+        return bool(self.pending)
+
+    def submit(self, fn, *args, on_done=None, on_error=None, **kwargs):
+        """Run fn in the pool; on_done/on_error are called on the Tk thread"""
+        future = self.pool.submit(fn, *args, **kwargs)
+        self.pending[future] = (on_done, on_error)
+        future.add_done_callback(self.done.put)
+        self._schedule_poll()
+        self._notify()
+        return future
+
+    def submit_stream(self, fn, *args, on_chunk=None, on_done=None, on_error=None, **kwargs):
+        """Run generator fn in the pool; chunks go to on_chunk and the joined text to on_done"""
+        chunks = queue.Queue()
+        stop = threading.Event()
+
+        def run():
+            parts = []
+            for chunk in fn(*args, **kwargs):
+                # Closing the generator also closes an open model stream
+                if stop.is_set():
+                    break
+                parts.append(chunk)
+                chunks.put(chunk)
+            return "".join(parts)
+
+        future = self.submit(run, on_done=on_done, on_error=on_error)
+        self.streams[future] = (chunks, on_chunk, stop)
+        return future
+
+    def cancel(self, future):
+        """Cancel a request; a running one finishes but its result is dropped"""
+        if future not in self.pending:
+            return False
+        future.cancel()
+        del self.pending[future]
+        stream = self.streams.pop(future, None)
+        if stream:
+            stream[2].set()
+        self.discarded.add(future)
+        self._notify()
+        return True
+
+    def cancel_all(self):
+        """Cancel every pending request, returning how many were cancelled"""
+        futures = list(self.pending)
+        for future in futures:
+            self.cancel(future)
+        return len(futures)
+
+    def shutdown(self):
+        self.cancel_all()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _schedule_poll(self):
+        if not self.polling:
+            self.polling = True
+            self.master.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        """Drain finished futures on the Tk thread"""
+        changed = False
+        while True:
+            try:
+                future = self.done.get_nowait()
+            except queue.Empty:
+                break
+
+            if future in self.discarded:
+                self.discarded.discard(future)
+                continue
+            on_done, on_error = self.pending.pop(future, (None, None))
+            stream = self.streams.pop(future, None)
+            if stream:
+                # Chunks are queued before their future completes, so they are painted first
+                self._drain(stream[0], stream[1])
+            changed = True
+
+            error = future.exception()
+            if error is not None:
+                if on_error:
+                    on_error(error)
+            elif on_done:
+                on_done(future.result())
+
+        # Finished requests are closed above before a later one starts painting
+        for chunks, on_chunk, _ in list(self.streams.values()):
+            self._drain(chunks, on_chunk)
+
+        if changed:
+            self._notify()
+
+        if self.pending or self.discarded:
+            self.master.after(self.poll_ms, self._poll)
+        else:
+            self.polling = False
+
+    @staticmethod
+    def _drain(chunks, on_chunk):
+        while True:
+            try:
+                chunk = chunks.get_nowait()
+            except queue.Empty:
+                return
+            if on_chunk:
+                on_chunk(chunk)
+
+    def _notify(self):
+        if self.on_change:
+            self.on_change()
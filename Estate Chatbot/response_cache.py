@@ -0,0 +1,186 @@
+import re
+import sqlite3
+import threading
+import time
+import hashlib
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_query(text):
+    """Canonical form of a question: NFC, lowercase, no punctuation, single spaces"""
+    text = unicodedata.normalize("NFC", text or "").lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+# Definition-style questions whose answer does not depend on who asks
+GENERIC_QUESTION = re.compile(
+    r"\b(là gì|là sao|nghĩa là gì|có nghĩa là|thế nào là|là như thế nào|khác gì|khác nhau)\b"
+)
+# Words that tie a question to the asker or their situation
+PERSONAL_WORDS = {"tôi", "mình", "tui", "tớ", "em", "anh", "chị", "vợ", "chồng", "con", "gia đình", "ngân sách"}
+# Words that do not change what is asked; the similarity fallback ignores them
+FILLER_WORDS = {"là", "gì", "sao", "vậy", "ạ", "à", "ơi", "nhỉ", "thế", "nào", "hả", "cho", "hỏi", "với", "bạn"}
+
+
+def is_generic_question(text):
+    """True for questions like "sổ hồng là gì" that get the same answer for every customer"""
+    query = normalize_query(text)
+    if not GENERIC_QUESTION.search(query):
+        return False
+    padded = f" {query} "
+    return not any(f" {word} " in padded for word in PERSONAL_WORDS)
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _content_words(text):
+    return frozenset(text.split()) - FILLER_WORDS
+
+
+class ResponseCache:
+    """Cache of model answers to generic real estate questions.
+
+    Keys are the normalized question plus a context key (e.g. a hash of the
+    staff document, since answers must follow it). Recently used entries live
+    in an in-memory LRU; everything is also persisted to SQLite so answers
+    survive restarts and are shared by every session. Entries expire after
+    ttl seconds. With similarity_threshold set, a miss falls back to the most
+    similar cached question (character trigram Jaccard) among the in-memory
+    entries with the same words apart from fillers, so "sổ hồng là gì" also
+    answers "sổ hồng là gì vậy" but not "sổ đỏ là gì".
+
+    Only answers that are the same for every customer belong here; see
+    is_generic_question().
+    """
+
+    def __init__(self, db_path="response_cache.db", max_entries=1000, ttl=7 * 24 * 3600,
+                 similarity_threshold=None):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        # (context_key, query) -> (response, created, trigrams, content words)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS responses (
+            context_key TEXT,
+            query TEXT,
+            response TEXT,
+            created REAL,
+            PRIMARY KEY (context_key, query)
+        )
+        ''')
+        self.conn.commit()
+        self._load()
+
+    @staticmethod
+    def context_key(*parts):
+        """Short hash identifying what an answer depends on besides the question"""
+        digest = hashlib.sha1()
+        for part in parts:
+            digest.update((part or "").encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _load(self):
+        """Warm the LRU with the newest unexpired entries"""
+        rows = self.conn.execute(
+            "SELECT context_key, query, response, created FROM responses WHERE created >= ? "
+            "ORDER BY created DESC LIMIT ?",
+            (time.time() - self.ttl, self.max_entries),
+        ).fetchall()
+        for context_key, query, response, created in reversed(rows):
+            self.entries[(context_key, query)] = (response, created, _trigrams(query), _content_words(query))
+
+    def _remember(self, key, response, created):
+        self.entries[key] = (response, created, _trigrams(key[1]), _content_words(key[1]))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self, query, context_key=""):
+        """Cached response for query, or None"""
+        query = normalize_query(query)
+        if not query:
+            return None
+        key = (context_key, query)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                row = self.conn.execute(
+                    "SELECT response, created FROM responses WHERE context_key = ? AND query = ?", key
+                ).fetchone()
+                if row:
+                    self._remember(key, *row)
+                    entry = self.entries[key]
+            if entry is not None and now - entry[1] > self.ttl:
+                self._forget(key)
+                entry = None
+            if entry is None and self.similarity_threshold is not None:
+                entry = self._most_similar(context_key, query, now)
+            if entry is None:
+                self.misses += 1
+                return None
+            if key in self.entries:
+                self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _most_similar(self, context_key, query, now):
+        grams = _trigrams(query)
+        words = _content_words(query)
+        best, best_score = None, self.similarity_threshold
+        for (entry_context, _), entry in self.entries.items():
+            if entry_context != context_key or now - entry[1] > self.ttl:
+                continue
+            # Close spelling is not enough: "sổ đỏ" and "sổ hồng" are different questions
+            if entry[3] != words:
+                continue
+            other = entry[2]
+            score = len(grams & other) / len(grams | other)
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def put(self, query, response, context_key=""):
+        """Store a response for query"""
+        query = normalize_query(query)
+        if not query or not response:
+            return
+        created = time.time()
+        with self.lock:
+            self._remember((context_key, query), response, created)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (context_key, query, response, created) VALUES (?, ?, ?, ?)",
+                (context_key, query, response, created),
+            )
+            self.conn.commit()
+
+    def _forget(self, key):
+        self.entries.pop(key, None)
+        self.conn.execute("DELETE FROM responses WHERE context_key = ? AND query = ?", key)
+        self.conn.commit()
+
+    def purge_expired(self):
+        """Delete expired entries from memory and disk"""
+        cutoff = time.time() - self.ttl
+        with self.lock:
+            for key in [key for key, entry in self.entries.items() if entry[1] < cutoff]:
+                del self.entries[key]
+            self.conn.execute("DELETE FROM responses WHERE created < ?", (cutoff,))
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
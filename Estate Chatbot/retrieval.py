@@ -0,0 +1,74 @@
+import numpy as np
+from sklearn.preprocessing import normalize
+
+
+class TfidfRetriever:
+    """Top-k cosine search over the TF-IDF listing vectors.
+
+    Rows are L2-normalized, so cosine similarity is a plain dot product. Without
+    a candidate set the query is multiplied against a term -> listings posting
+    matrix, which only touches listings sharing a term with the query; with one,
+    only the candidate rows are scored. The top k are then picked with
+    argpartition instead of sorting every score.
+    """
+
+    # Cosine similarity needed for a general inquiry to count as a match
+    threshold = 0.1
+    # Match counts from top_k are exact
+    count_limit = None
+
+    def __init__(self, vectorizer, search_vectors, postings=None):
+        self.vectorizer = vectorizer
+        vectors = search_vectors.tocsr()
+        if getattr(vectorizer, 'norm', None) != 'l2':
+            vectors = normalize(vectors, norm='l2', copy=True)
+            # A saved transpose is of the unnormalized vectors
+            postings = None
+        self.vectors = vectors
+        self._postings = postings
+
+    @property
+    def postings(self):
+        """Term -> listings matrix (transpose of the vectors), built on first use"""
+        if self._postings is None:
+            self._postings = self.vectors.T.tocsr()
+        return self._postings
+
+    def scores(self, query, candidates=None):
+        """(rows, scores) for every row with a non-zero similarity to query"""
+        query_vector = self.vectorizer.transform([query])
+        if getattr(self.vectorizer, 'norm', None) != 'l2':
+            query_vector = normalize(query_vector, norm='l2', copy=False)
+        if query_vector.nnz == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        if candidates is None:
+            result = (query_vector @ self.postings).tocsr()
+            return result.indices.astype(np.int64), result.data
+
+        candidates = np.asarray(candidates, dtype=np.int64)
+        result = (self.vectors[candidates] @ query_vector.T).tocoo()
+        return candidates[result.row], result.data
+
+    def match(self, query, threshold, candidates=None):
+        """Rows whose similarity to query is at least threshold (unordered)"""
+        rows, scores = self.scores(query, candidates)
+        return rows[scores >= threshold]
+
+    def top_k(self, query, k, threshold=0.0, candidates=None):
+        """Best k rows by similarity, plus how many rows passed the threshold.
+
+        Returns (rows, scores, match_count) with rows sorted by descending score.
+        """
+        rows, scores = self.scores(query, candidates)
+        keep = scores >= threshold
+        rows, scores = rows[keep], scores[keep]
+        match_count = len(rows)
+
+        if k <= 0:
+            return rows[:0], scores[:0], match_count
+        if match_count > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return rows[order], scores[order], match_count
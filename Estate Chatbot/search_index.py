@@ -0,0 +1,251 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import sys
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from data_prepare import load_data, prepare_search_frame, compact_frame, search_texts, DATA_PATH
+from property_index import PropertyIndex, AddressIndex
+from retrieval import TfidfRetriever
+from preference_rules import PreferenceExtractor
+from listing_renderer import ListingRenderer
+from aggregate_cube import AggregateCube
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the cleaning, search text, vectorizer settings or file layout change
+ARTIFACT_VERSION = 4
+INDEX_DIR = "data/index"
+
+
+class SearchIndex:
+    """Cleaned property frame, fitted TF-IDF search vectors and filter indexes.
+
+    Read-only once built, so one instance can be shared by every chatbot session.
+    A loaded index keeps the frame columns and the sparse matrices memory-mapped
+    from the artifact files, so processes loading the same artifact share them.
+    """
+
+    def __init__(self, properties, vectorizer, search_vectors, postings=None):
+        self.properties = properties
+        self.vectorizer = vectorizer
+        self.search_vectors = search_vectors
+
+        # Column and address indexes used by _filter_properties
+        self.property_index = PropertyIndex(properties)
+        self.address_index = AddressIndex(properties['Address'])
+
+        # Local parser for simple search messages, with district names from the addresses
+        self.preference_extractor = PreferenceExtractor(self.address_index.locations)
+
+        # District x bedrooms x direction statistics for the feature questions
+        self.aggregate_cube = AggregateCube(properties, self.address_index)
+
+        # Listing cards for replies, built on first use
+        self.renderer = ListingRenderer(properties)
+
+        # Top-k similarity search over the TF-IDF vectors
+        self.retriever = TfidfRetriever(vectorizer, search_vectors, postings)
+
+        # Optional embedding-based retriever, see attach_dense_retriever
+        self.dense_retriever = None
+
+
+def build_search_index(property_data):
+    """Clean the property frame and fit the TF-IDF vectorizer over it"""
+    properties = prepare_search_frame(property_data)
+
+    # Prepare vectorizer for text similarity
+    vectorizer = TfidfVectorizer(
+        analyzer='word',
+        ngram_range=(1, 2),
+        min_df=2,
+        max_df=0.95,
+        stop_words=['và', 'có', 'là', 'với', 'tại', 'trong', 'của']
+    )
+    search_vectors = vectorizer.fit_transform(properties['search_text']).tocsr()
+
+    # Only the typed columns stay in memory; descriptions are rebuilt per page
+    return SearchIndex(compact_frame(properties), vectorizer, search_vectors)
+
+
+def csv_fingerprint(csv_path):
+    """Hash of the CSV contents and the artifact version, used as the cache key"""
+    digest = hashlib.sha256()
+    digest.update(f"v{ARTIFACT_VERSION}".encode())
+    with open(csv_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def artifact_path(fingerprint, index_dir=INDEX_DIR):
+    return os.path.join(index_dir, f"v{ARTIFACT_VERSION}-{fingerprint}")
+
+
+def _save_csr(matrix, path, name):
+    """CSR arrays as plain .npy files so they can be memory-mapped on load"""
+    np.save(os.path.join(path, f"{name}_data.npy"), matrix.data)
+    np.save(os.path.join(path, f"{name}_indices.npy"), matrix.indices)
+    np.save(os.path.join(path, f"{name}_indptr.npy"), matrix.indptr)
+
+
+def _load_csr(path, name, shape):
+    """CSR matrix over memory-mapped arrays (read-only, shared through the page cache)"""
+    return sparse.csr_matrix((
+        np.load(os.path.join(path, f"{name}_data.npy"), mmap_mode="r"),
+        np.load(os.path.join(path, f"{name}_indices.npy"), mmap_mode="r"),
+        np.load(os.path.join(path, f"{name}_indptr.npy"), mmap_mode="r"),
+    ), shape=tuple(shape), copy=False)
+
+
+def save_frame(properties, path):
+    """Frame columns as .npy files: codes plus category values for categoricals"""
+    columns = []
+    for i, column in enumerate(properties.columns):
+        values = properties[column]
+        # Plain text columns cannot be memory-mapped; store them dictionary-encoded too
+        if values.dtype == object:
+            values = values.astype('category')
+        entry = {"name": column, "file": f"column_{i}.npy"}
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            np.save(os.path.join(path, entry["file"]), values.cat.codes.to_numpy())
+            entry["categories"] = values.cat.categories.tolist()
+        else:
+            np.save(os.path.join(path, entry["file"]), values.to_numpy())
+        columns.append(entry)
+    with open(os.path.join(path, "frame.json"), "w", encoding="utf-8") as file:
+        json.dump({"columns": columns}, file, ensure_ascii=False)
+
+
+def load_frame(path):
+    """Frame saved by save_frame, its columns memory-mapped rather than read"""
+    with open(os.path.join(path, "frame.json"), encoding="utf-8") as file:
+        columns = json.load(file)["columns"]
+    data = {}
+    for entry in columns:
+        values = np.load(os.path.join(path, entry["file"]), mmap_mode="r")
+        if "categories" in entry:
+            values = pd.Categorical.from_codes(values, entry["categories"])
+        data[entry["name"]] = values
+    # copy=False keeps each column on its mapped file instead of consolidating into new blocks
+    return pd.DataFrame(data, copy=False)
+
+
+def save_search_index(search_index, path, fingerprint):
+    """Write the index to path (written to a temp dir first, then renamed)"""
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    save_frame(search_index.properties, tmp_path)
+
+    # The stop word set is only needed for fitting and bloats the pickle
+    vectorizer = search_index.vectorizer
+    if hasattr(vectorizer, "stop_words_"):
+        delattr(vectorizer, "stop_words_")
+    with open(os.path.join(tmp_path, "vectorizer.pkl"), "wb") as file:
+        pickle.dump(vectorizer, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # The vectors and their transpose used for unrestricted searches
+    vectors = search_index.search_vectors
+    _save_csr(vectors, tmp_path, "vectors")
+    _save_csr(search_index.retriever.postings, tmp_path, "postings")
+
+    with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as file:
+        json.dump({
+            "version": ARTIFACT_VERSION,
+            "fingerprint": fingerprint,
+            "rows": len(search_index.properties),
+            "shape": list(vectors.shape),
+        }, file)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def load_search_index_artifact(path, fingerprint):
+    """Load a saved index, or return None if it is missing or stale"""
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        # Nothing saved yet: the normal first run, not an error
+        return None
+    try:
+        with open(meta_path, encoding="utf-8") as file:
+            meta = json.load(file)
+        if meta.get("version") != ARTIFACT_VERSION or meta.get("fingerprint") != fingerprint:
+            return None
+
+        properties = load_frame(path)
+        with open(os.path.join(path, "vectorizer.pkl"), "rb") as file:
+            vectorizer = pickle.load(file)
+
+        search_vectors = _load_csr(path, "vectors", meta["shape"])
+        postings = _load_csr(path, "postings", meta["shape"][::-1])
+        return SearchIndex(properties, vectorizer, search_vectors, postings)
+    except (OSError, ValueError, KeyError, pickle.UnpicklingError) as e:
+        logger.warning(f"Ignoring unreadable search index at {path}: {e}")
+        return None
+
+
+def attach_dense_retriever(search_index, path, model_name):
+    """Load the dense ANN index saved next to the artifact, building it if needed"""
+    from dense_retrieval import DenseRetriever
+
+    retriever = DenseRetriever.load(path, model_name)
+    if retriever is None or len(retriever) != len(search_index.properties):
+        logger.info(f"Embedding {len(search_index.properties)} properties with {model_name}")
+        retriever = DenseRetriever(model_name)
+        retriever.add(search_texts(search_index.properties))
+        try:
+            retriever.save(path)
+        except OSError as e:
+            logger.warning(f"Could not save dense index to {path}: {e}")
+    search_index.dense_retriever = retriever
+    return search_index
+
+
+def load_search_index(csv_path=DATA_PATH, index_dir=INDEX_DIR, dense_model=None):
+    """Load the index for csv_path from disk, building and saving it if needed.
+
+    With dense_model set, an embedding ANN index is attached as well.
+    """
+    fingerprint = csv_fingerprint(csv_path)
+    path = artifact_path(fingerprint, index_dir)
+
+    search_index = load_search_index_artifact(path, fingerprint)
+    if search_index is not None:
+        logger.info(f"Loaded search index {path}")
+        if dense_model:
+            attach_dense_retriever(search_index, path, dense_model)
+        return search_index
+
+    logger.info(f"Building search index for {csv_path}")
+    property_data = load_data(csv_path)
+    search_index = build_search_index(property_data)
+    if len(property_data):
+        try:
+            save_search_index(search_index, path, fingerprint)
+        except OSError as e:
+            logger.warning(f"Could not save search index to {path}: {e}")
+    if dense_model:
+        attach_dense_retriever(search_index, path, dense_model)
+    return search_index
+
+
+if __name__ == "__main__":
+    # Offline build: python search_index.py [csv_path]
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else DATA_PATH
+    fingerprint = csv_fingerprint(csv_path)
+    path = artifact_path(fingerprint)
+    property_data = load_data(csv_path)
+    if property_data.empty:
+        sys.exit(f"No properties loaded from {csv_path}")
+    save_search_index(build_search_index(property_data), path, fingerprint)
+    logger.info(f"Wrote search index {path}")
@@ -0,0 +1,345 @@
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web, WSMsgType
+
+from chatbot import RealEstateChatbot, API_KEY, default_prompt_builder
+from llm_gateway import gateway_from_env
+from user_context_db import UserContextDatabase
+from search_index import load_search_index
+from response_cache import ResponseCache
+from session_store import SessionStore
+from data_prepare import DATA_PATH
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler("chatbot.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+class ChatServer:
+    """Headless HTTP/WebSocket front end serving many chatbot sessions.
+
+    The search index and the database connection are loaded once and shared;
+    each session only owns a RealEstateChatbot with its own preferences and
+    history. Chatbot turns are blocking (OpenAI client, pandas), so they run in
+    a thread pool and their chunks are forwarded to the event loop as they come.
+    """
+
+    def __init__(self, search_index, db, document=None, workers=32, idle_timeout=1800,
+                 max_sessions=1000, structured_output=False, response_cache=None, llm_gateway=None):
+        self.search_index = search_index
+        self.db = db
+        self.response_cache = response_cache
+        self.llm_gateway = llm_gateway
+        self.document = document
+        self.structured_output = structured_output
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="turn")
+        self.sessions = SessionStore(
+            self._create_chatbot,
+            idle_timeout=idle_timeout,
+            max_sessions=max_sessions,
+            on_evict=self._end_session,
+        )
+
+    def _create_chatbot(self, user_id):
+        return RealEstateChatbot(
+            self.search_index.properties,
+            self.document,
+            structured_output=self.structured_output,
+            search_index=self.search_index,
+            db=self.db,
+            response_cache=self.response_cache,
+            llm_gateway=self.llm_gateway,
+            user_id=user_id,
+        )
+
+    def _open_session(self):
+        session = self.sessions.create()
+        self.db.add_user(session.chatbot.user_id)
+        self.db.create_conversation(session.conversation_id, session.chatbot.user_id)
+        return session
+
+    def _end_session(self, session):
+        self.db.end_conversation(session.conversation_id)
+
+    def _save_preferences(self, chatbot):
+        """Store the chatbot's current preferences in the database format"""
+        preferences = chatbot.get_user_preferences()
+        self.db.update_user_preferences(
+            chatbot.user_id,
+            min_price=preferences['min_price'],
+            max_price=preferences['max_price'],
+            min_area=preferences['min_area'],
+            max_area=preferences['max_area'],
+            min_bedrooms=preferences['bedrooms'],
+            min_bathrooms=preferences['bathrooms'],
+            preferred_districts=preferences['locations'],
+            preferred_direction=preferences['house_direction'],
+            furniture_state=preferences['furniture_state'],
+            legal_state=preferences['legal_state'],
+        )
+
+    def _run_turn(self, session, message, staff_suggestion):
+        """Generator run in the pool: one locked turn, yielding response chunks"""
+        with session.turn_lock:
+            self.db.add_message(session.conversation_id, "user", message)
+            chunks = []
+            for chunk in session.chatbot.process_message_stream(message, staff_suggestion):
+                chunks.append(chunk)
+                yield chunk
+            response = "".join(chunks)
+
+            # The turn's writes go to the database as one transaction
+            with self.db.transaction():
+                message_id = self.db.add_message(session.conversation_id, "bot", response)
+                if staff_suggestion:
+                    self.db.add_staff_suggestion(session.conversation_id, message_id, staff_suggestion)
+                self._save_preferences(session.chatbot)
+
+    async def _stream_turn(self, session, message, staff_suggestion):
+        """Async iterator over the chunks of a turn running in the pool"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        done = object()
+
+        def produce():
+            try:
+                for chunk in self._run_turn(session, message, staff_suggestion):
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        loop.run_in_executor(self.pool, produce)
+        while True:
+            item = await queue.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def _get_session(self, request):
+        session = self.sessions.get(request.match_info["session_id"])
+        if session is None:
+            raise web.HTTPNotFound(text="Unknown or expired session")
+        return session
+
+    async def create_session(self, request):
+        loop = asyncio.get_running_loop()
+        session = await loop.run_in_executor(self.pool, self._open_session)
+        return web.json_response({
+            "session_id": session.session_id,
+            "user_id": session.chatbot.user_id,
+            "conversation_id": session.conversation_id,
+        })
+
+    async def delete_session(self, request):
+        loop = asyncio.get_running_loop()
+        session = await loop.run_in_executor(self.pool, self.sessions.remove, request.match_info["session_id"])
+        if session is None:
+            raise web.HTTPNotFound(text="Unknown or expired session")
+        return web.json_response({"status": "closed"})
+
+    async def post_message(self, request):
+        """POST {message, staff_suggestion}; the reply is streamed as chunked text"""
+        session = self._get_session(request)
+        body = await request.json()
+        message = body.get("message", "")
+        staff_suggestion = body.get("staff_suggestion")
+
+        response = web.StreamResponse(headers={"Content-Type": "text/plain; charset=utf-8"})
+        await response.prepare(request)
+        try:
+            async for chunk in self._stream_turn(session, message, staff_suggestion):
+                await response.write(chunk.encode("utf-8"))
+        except Exception as e:
+            logger.error(f"Error processing message for session {session.session_id}: {e}")
+            await response.write("Xin lỗi, đã có lỗi xảy ra khi xử lý yêu cầu của bạn.".encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    async def websocket(self, request):
+        """WebSocket: send {message, staff_suggestion}, receive token/done events"""
+        session = self._get_session(request)
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            session.touch()
+            try:
+                body = json.loads(msg.data)
+            except json.JSONDecodeError:
+                await ws.send_json({"type": "error", "error": "Invalid JSON"})
+                continue
+
+            chunks = []
+            try:
+                async for chunk in self._stream_turn(session, body.get("message", ""), body.get("staff_suggestion")):
+                    chunks.append(chunk)
+                    await ws.send_json({"type": "token", "text": chunk})
+                await ws.send_json({"type": "done", "response": "".join(chunks)})
+            except Exception as e:
+                logger.error(f"Error processing message for session {session.session_id}: {e}")
+                await ws.send_json({"type": "error", "error": str(e)})
+        return ws
+
+    async def health(self, request):
+        return web.json_response({"status": "ok", "sessions": len(self.sessions)})
+
+    async def metrics(self, request):
+        """Prompt token counters of the extraction calls"""
+        return web.json_response({"prompt": default_prompt_builder.metrics()})
+
+    async def _evict_loop(self, app):
+        while True:
+            await asyncio.sleep(60)
+            evicted = await asyncio.get_running_loop().run_in_executor(self.pool, self.sessions.evict_idle)
+            if evicted:
+                logger.info(f"Evicted {evicted} idle sessions")
+
+    async def _start_background(self, app):
+        app["evict_task"] = asyncio.create_task(self._evict_loop(app))
+
+    async def _stop_background(self, app):
+        app["evict_task"].cancel()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.db.flush()
+
+    def make_app(self):
+        app = web.Application()
+        app.add_routes([
+            web.get("/health", self.health),
+            web.get("/metrics", self.metrics),
+            web.post("/sessions", self.create_session),
+            web.delete("/sessions/{session_id}", self.delete_session),
+            web.post("/sessions/{session_id}/messages", self.post_message),
+            web.get("/sessions/{session_id}/ws", self.websocket),
+        ])
+        app.on_startup.append(self._start_background)
+        app.on_cleanup.append(self._stop_background)
+        return app
+
+
+def serve_workers(make_server, processes, host, port):
+    """Prefork: run `processes` server processes, worker i listening on port + i.
+
+    Call it once the search index is loaded. The forked workers share its
+    pages with the parent: the frame columns and sparse matrices are mapped
+    from the artifact files and the other read-only arrays are copy-on-write.
+    make_server runs in each worker after the fork, so the SQLite
+    connection, the response cache, the httpx model client and the thread
+    pool are created per process and never inherited from the parent.
+
+    Sessions live in the worker that created them, and another worker
+    answers 404 for them. Clients therefore need session affinity: put the
+    ports behind a proxy with sticky routing (e.g. nginx ip_hash).
+    """
+    # Keep the garbage collector from touching (and so copying) the shared objects
+    gc.freeze()
+    children = []
+    for worker in range(processes):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                web.run_app(make_server().make_app(), host=host, port=port + worker)
+            except Exception:
+                logger.exception(f"Worker {worker} failed")
+                status = 1
+            finally:
+                os._exit(status)
+        children.append(pid)
+        logger.info(f"Started worker {worker} (pid {pid}) on port {port + worker}")
+
+    def stop_children(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    # Ctrl+C already reaches the workers through the process group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, stop_children)
+    for pid in children:
+        os.waitpid(pid, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Real estate chatbot server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--data", default=DATA_PATH, help="Property CSV")
+    parser.add_argument("--document", help="Staff document (plain text) used for every session")
+    parser.add_argument("--workers", type=int, default=32, help="Threads running chatbot turns")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Server processes sharing one search index, on ports port..port+N-1. "
+                             "Sessions stay in one process, so use a sticky proxy in front")
+    parser.add_argument("--idle-timeout", type=int, default=1800, help="Seconds before an idle session is dropped")
+    parser.add_argument("--max-sessions", type=int, default=1000)
+    parser.add_argument("--structured-output", action="store_true", help="One LLM call per turn")
+    parser.add_argument("--dense-model", help="Sentence-embedding model for semantic search "
+                        "(needs sentence-transformers and faiss-cpu)")
+    parser.add_argument("--flush-interval", type=float, default=0.5,
+                        help="Seconds to defer database commits (0 commits every write)")
+    parser.add_argument("--synchronous", default="NORMAL", help="SQLite synchronous setting")
+    parser.add_argument("--llm-timeout", type=float, default=30, help="Seconds per model request")
+    parser.add_argument("--llm-concurrency", type=int, default=16, help="Model requests in flight at once")
+    parser.add_argument("--hedge-after", type=float,
+                        help="Send a second copy of model requests slower than this many seconds")
+    parser.add_argument("--cache-ttl", type=float, default=7 * 24 * 3600,
+                        help="Seconds a cached answer to a generic question stays valid (0 disables the cache)")
+    parser.add_argument("--cache-similarity", type=float,
+                        help="Also reuse answers to questions at least this similar (0-1)")
+    args = parser.parse_args()
+
+    document = None
+    if args.document:
+        with open(args.document, "r", encoding="utf-8") as file:
+            document = file.read()
+
+    # Loaded once; with --processes the workers share it
+    search_index = load_search_index(args.data, dense_model=args.dense_model)
+
+    def make_server():
+        return ChatServer(
+            search_index,
+            UserContextDatabase(synchronous=args.synchronous, flush_interval=args.flush_interval or None),
+            document=document,
+            workers=args.workers,
+            idle_timeout=args.idle_timeout,
+            max_sessions=args.max_sessions,
+            structured_output=args.structured_output,
+            response_cache=ResponseCache(ttl=args.cache_ttl, similarity_threshold=args.cache_similarity)
+            if args.cache_ttl else None,
+            llm_gateway=gateway_from_env(
+                api_key=API_KEY,
+                timeout=args.llm_timeout,
+                max_concurrency=args.llm_concurrency,
+                hedge_after=args.hedge_after,
+            ),
+        )
+
+    if args.processes > 1:
+        serve_workers(make_server, args.processes, args.host, args.port)
+    else:
+        web.run_app(make_server().make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
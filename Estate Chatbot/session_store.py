@@ -0,0 +1,81 @@
+import threading
+import time
+import uuid
+
+
+class Session:
+    """Per-customer chatbot state plus bookkeeping for idle eviction"""
+
+    def __init__(self, session_id, chatbot, conversation_id):
+        self.session_id = session_id
+        self.chatbot = chatbot
+        self.conversation_id = conversation_id
+        self.last_seen = time.monotonic()
+        # Turns within one session are handled one at a time
+        self.turn_lock = threading.Lock()
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+
+class SessionStore:
+    """In-memory session registry with idle-timeout and size-based eviction.
+
+    Sessions only hold the per-user parts of RealEstateChatbot (preferences,
+    history, last results); the property index is shared between all of them.
+    """
+
+    def __init__(self, create_chatbot, idle_timeout=1800, max_sessions=1000, on_evict=None):
+        self.create_chatbot = create_chatbot
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.on_evict = on_evict
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def create(self):
+        """Start a new session, evicting the least recently used one if full"""
+        # Sessions share one database, so every session gets its own user id
+        chatbot = self.create_chatbot(f"user_{uuid.uuid4().hex}")
+        session = Session(uuid.uuid4().hex, chatbot, str(uuid.uuid4()))
+        evicted = []
+        with self.lock:
+            while len(self.sessions) >= self.max_sessions:
+                oldest = min(self.sessions.values(), key=lambda s: s.last_seen)
+                evicted.append(self.sessions.pop(oldest.session_id))
+            self.sessions[session.session_id] = session
+        self._evicted(evicted)
+        return session
+
+    def get(self, session_id):
+        """Return a live session (refreshing its idle timer) or None"""
+        with self.lock:
+            session = self.sessions.get(session_id)
+        if session is not None:
+            session.touch()
+        return session
+
+    def remove(self, session_id):
+        with self.lock:
+            session = self.sessions.pop(session_id, None)
+        if session is not None:
+            self._evicted([session])
+        return session
+
+    def evict_idle(self):
+        """Drop sessions idle for longer than idle_timeout; returns how many"""
+        cutoff = time.monotonic() - self.idle_timeout
+        with self.lock:
+            expired = [s for s in self.sessions.values() if s.last_seen < cutoff and not s.turn_lock.locked()]
+            for session in expired:
+                del self.sessions[session.session_id]
+        self._evicted(expired)
+        return len(expired)
+
+    def _evicted(self, sessions):
+        if self.on_evict:
+            for session in sessions:
+                self.on_evict(session)
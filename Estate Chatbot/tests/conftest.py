@@ -0,0 +1,19 @@
+import os
+import sys
+import pytest
+
+# The modules live flat in the parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "data", "vietnam_housing_dataset.csv")
+
+
+@pytest.fixture(scope="session")
+def search_index():
+    """Search index over the first listings of the bundled CSV"""
+    if not os.path.exists(CSV_PATH):
+        pytest.skip("listing CSV not available")
+    from data_prepare import load_data
+    from search_index import build_search_index
+    return build_search_index(load_data(CSV_PATH).head(500))
@@ -0,0 +1,59 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+import pytest
+
+from property_index import AddressIndex, normalize_text
+from conftest import CSV_PATH
+
+LOCATIONS = [
+    'Hà Nội',
+    'Cầu Giấy, Hà Nội',
+    'quận 7',
+    'Hà Đông',
+    'Nam Từ Liêm',
+    'Nam Từ Liêm, Hà Nội',
+    'Hồ Chí Minh',
+    'Thủ Đức',
+    'Phường Dịch Vọng',
+    'Vinhomes',
+    'không có địa chỉ này',
+]
+
+
+def regex_mask(addresses, location):
+    """The per-row match the address index replaced"""
+    query = normalize_text(location)
+    pattern = re.compile(rf'\b{re.escape(query)}\b')
+    return np.array([pattern.search(normalize_text(address)) is not None for address in addresses])
+
+
+@pytest.fixture(scope="module")
+def addresses():
+    if not os.path.exists(CSV_PATH):
+        pytest.skip("listing CSV not available")
+    return pd.read_csv(CSV_PATH)['Address'].fillna('')
+
+
+@pytest.fixture(scope="module")
+def index(addresses):
+    return AddressIndex(addresses)
+
+
+@pytest.mark.parametrize("location", LOCATIONS)
+def test_lookup_matches_regex(addresses, index, location):
+    expected = regex_mask(addresses, location)
+    assert np.array_equal(index.lookup(location), expected)
+
+
+def test_lookup_any_matches_regex(addresses, index):
+    locations = ['quận 7', 'Hà Đông']
+    expected = regex_mask(addresses, locations[0]) | regex_mask(addresses, locations[1])
+    assert np.array_equal(index.lookup_any(locations), expected)
+
+
+def test_lookup_finds_components_containing_the_name():
+    index = AddressIndex(pd.Series(["Cầu Giấy, Hà Nội", "Cầu Giấy, Hà Nội.", "Đường Hà Nội, Thủ Đức, Hồ Chí Minh"]))
+    assert index.lookup("Hà Nội").tolist() == [True, True, True]
+    assert index.lookup("Cầu Giấy, Hà Nội").tolist() == [True, True, False]
@@ -0,0 +1,29 @@
+import os
+import pytest
+
+from data_prepare import load_data, prepare_search_frame, compact_frame, with_descriptions, search_texts
+from conftest import CSV_PATH
+
+
+@pytest.fixture(scope="module")
+def prepared():
+    if not os.path.exists(CSV_PATH):
+        pytest.skip("listing CSV not available")
+    return prepare_search_frame(load_data(CSV_PATH))
+
+
+def test_compact_frame_rebuilds_the_same_text(prepared):
+    compact = compact_frame(prepared)
+    assert with_descriptions(compact)['description'].tolist() == prepared['description'].tolist()
+    assert search_texts(compact).tolist() == prepared['search_text'].tolist()
+
+    rows = [0, 7, len(compact) - 1]
+    page = with_descriptions(compact.iloc[rows])
+    assert page['description'].tolist() == prepared['description'].iloc[rows].tolist()
+
+
+def test_compact_frame_keeps_missing_counts_missing(prepared):
+    compact = compact_frame(prepared)
+    assert compact['Bedrooms'].isna().any()
+    assert 0 not in compact['Bedrooms'].value_counts().index
+    assert compact['Price'].dtype == prepared['Price'].dtype
@@ -0,0 +1,74 @@
+import time
+import pytest
+
+from llm_gateway import LLMGateway, LLMUnavailableError, CircuitBreaker
+from llm_stub import StubLLMServer
+
+MESSAGES = [{"role": "user", "content": "sổ hồng là gì"}]
+
+
+@pytest.fixture
+def make_gateway():
+    gateways = []
+
+    def make(server, **kwargs):
+        settings = dict(models=("model-a", "model-b"), timeout=5, max_retries=1, backoff=0.01)
+        settings.update(kwargs)
+        gateway = LLMGateway(base_url=server.base_url, api_key="test", **settings)
+        gateways.append(gateway)
+        return gateway
+
+    yield make
+    for gateway in gateways:
+        gateway.close()
+
+
+def test_failing_provider_raises_and_releases_slots(make_gateway):
+    with StubLLMServer(fail_rate=1.0) as server:
+        gateway = make_gateway(server, max_concurrency=4)
+        with pytest.raises(LLMUnavailableError):
+            gateway.complete(MESSAGES)
+
+        # Two attempts on each model, and every slot is free again
+        assert server.requests == 4
+        assert gateway.slots._value == 4
+
+
+def test_breaker_opens_after_configured_failures(make_gateway):
+    with StubLLMServer(fail_rate=1.0) as server:
+        gateway = make_gateway(server, models=("model-a",), max_retries=4)
+        with pytest.raises(LLMUnavailableError):
+            gateway.complete(MESSAGES)
+        assert not gateway.breakers["model-a"].allow()
+
+        # An open breaker skips the model without calling it
+        requests = server.requests
+        with pytest.raises(LLMUnavailableError):
+            gateway.complete(MESSAGES)
+        assert server.requests == requests
+
+
+def test_circuit_breaker_counts_consecutive_failures():
+    breaker = CircuitBreaker(failures=3, cooldown=60)
+    for _ in range(2):
+        breaker.record(False)
+    assert breaker.allow()
+    breaker.record(True)
+    for _ in range(3):
+        breaker.record(False)
+    assert not breaker.allow()
+
+
+def test_hedged_request_returns_the_faster_reply(make_gateway):
+    with StubLLMServer(reply="Nhanh", latencies=[2.0, 0.0]) as server:
+        gateway = make_gateway(server, hedge_after=0.1)
+        started = time.monotonic()
+        assert gateway.complete(MESSAGES) == "Nhanh"
+        assert time.monotonic() - started < 1.5
+        assert server.requests == 2
+
+
+def test_stream_yields_chunks_in_order(make_gateway):
+    with StubLLMServer(reply="một hai ba bốn") as server:
+        gateway = make_gateway(server)
+        assert list(gateway.stream(MESSAGES)) == ["một", " hai", " ba", " bốn"]
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from chatbot import RealEstateChatbot
+from preference_rules import PreferenceExtractor
+from property_index import AddressIndex
+from user_context_db import UserContextDatabase
+
+
+@pytest.fixture
+def chatbot(tmp_path, search_index):
+    db = UserContextDatabase(db_path=str(tmp_path / "users.db"))
+    yield RealEstateChatbot(search_index.properties, None, search_index=search_index, db=db)
+    db.close()
+
+
+def test_one_sided_bound_keeps_the_other(chatbot):
+    extractor = chatbot.preference_extractor
+    assert extractor.extract("dưới 5 tỷ")[0] == {'max_price': 5.0}
+    assert extractor.extract("từ 60m2")[0] == {'min_area': 60.0}
+
+
+def test_second_turn_keeps_earlier_minimum(chatbot):
+    assert chatbot._update_user_preferences("giá từ 3 tỷ") is True
+    assert chatbot._update_user_preferences("dưới 5 tỷ") is True
+
+    assert chatbot.user_preferences['min_price'] == 3.0
+    assert chatbot.user_preferences['max_price'] == 5.0
+
+
+def test_locations_with_stray_whitespace_are_found():
+    addresses = pd.Series(["Phường  Dịch Vọng, Quận Cầu   Giấy , Hà Nội", "Xã Long Hưng, Văn Giang, Hưng Yên"])
+    index = AddressIndex(addresses)
+    extractor = PreferenceExtractor(index.locations)
+
+    preferences, _ = extractor.extract("tìm nhà ở quận cầu giấy")
+    assert preferences['locations'] == ['Quận Cầu   Giấy']
+    assert index.lookup_any(preferences['locations']).tolist() == [True, False]
+
+    preferences, _ = extractor.extract("tìm nhà ở dịch vọng")
+    assert preferences['locations'] == ['Dịch Vọng']
+    assert index.lookup_any(preferences['locations']).tolist() == [True, False]
@@ -0,0 +1,80 @@
+import pytest
+
+from chatbot import RealEstateChatbot
+from response_cache import ResponseCache, is_generic_question
+from user_context_db import UserContextDatabase
+
+
+class FakeLLM:
+    """Answers like a model that uses whatever profile is in the prompt"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def complete(self, messages, **kwargs):
+        self.calls += 1
+        prompt = messages[-1]["content"]
+        answer = "Lộ giới là ranh giới đường đỏ quy hoạch."
+        if "Lan" in prompt:
+            answer += " Với ngân sách 5 tỷ, chị Lan nên chọn nhà không vướng lộ giới."
+        return answer
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "cache.db"))
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def make_chatbot(tmp_path, search_index, cache):
+    db = UserContextDatabase(db_path=str(tmp_path / "users.db"))
+    llm = FakeLLM()
+
+    def make(user_information=None):
+        chatbot = RealEstateChatbot(search_index.properties, None, search_index=search_index, db=db,
+                                    response_cache=cache, llm_gateway=llm)
+        chatbot.user_information = user_information or {}
+        return chatbot
+
+    make.llm = llm
+    yield make
+    db.close()
+
+
+def test_two_users_asking_the_same_question(make_chatbot):
+    lan = make_chatbot({"name": "Lan", "budget": "5 tỷ"})
+    other = make_chatbot()
+
+    first = lan._update_user_preferences("Lộ giới là gì?")
+    second = other._update_user_preferences("lộ giới là gì")
+
+    # The shared answer comes from a prompt without Lan's profile
+    assert "Lan" not in first
+    assert second == first
+    assert make_chatbot.llm.calls == 1
+
+
+def test_personal_questions_are_not_cached(make_chatbot, cache):
+    lan = make_chatbot({"name": "Lan", "budget": "5 tỷ"})
+    answer = lan._update_user_preferences("Với ngân sách của tôi thì lộ giới là gì?")
+
+    assert "Lan" in answer
+    assert cache.get("Với ngân sách của tôi thì lộ giới là gì?", lan.document_key) is None
+
+
+def test_is_generic_question():
+    assert is_generic_question("Sổ hồng là gì?")
+    assert is_generic_question("thế nào là lộ giới")
+    assert not is_generic_question("tôi muốn tìm nhà 3 phòng ngủ")
+    assert not is_generic_question("nhà của tôi có sổ hồng là sao")
+
+
+def test_similarity_needs_the_same_words(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "cache.db"), similarity_threshold=0.5)
+    cache.put("sổ hồng là gì", "Sổ hồng là giấy chứng nhận quyền sở hữu nhà ở.")
+
+    assert cache.get("sổ hồng là gì vậy") == "Sổ hồng là giấy chứng nhận quyền sở hữu nhà ở."
+    assert cache.get("sổ đỏ là gì") is None
+    cache.close()
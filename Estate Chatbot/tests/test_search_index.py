@@ -0,0 +1,16 @@
+import logging
+
+from search_index import load_search_index_artifact
+
+
+def test_missing_artifact_is_a_quiet_miss(tmp_path, caplog):
+    with caplog.at_level(logging.WARNING):
+        assert load_search_index_artifact(str(tmp_path / "index"), "fingerprint") is None
+    assert caplog.records == []
+
+
+def test_corrupt_artifact_is_logged(tmp_path, caplog):
+    (tmp_path / "meta.json").write_text("{not json", encoding="utf-8")
+    with caplog.at_level(logging.WARNING):
+        assert load_search_index_artifact(str(tmp_path), "fingerprint") is None
+    assert "Ignoring unreadable search index" in caplog.text
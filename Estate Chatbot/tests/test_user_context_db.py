@@ -0,0 +1,36 @@
+import sqlite3
+import pytest
+
+from session_store import SessionStore
+from user_context_db import UserContextDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = UserContextDatabase(db_path=str(tmp_path / "users.db"))
+    yield db
+    db.close()
+
+
+def test_add_user_never_overwrites(db):
+    db.add_user("user_1", name="Lan")
+    with pytest.raises(sqlite3.IntegrityError):
+        db.add_user("user_1", name="Minh")
+    assert db.get_user("user_1")["name"] == "Lan"
+
+
+def test_sessions_get_distinct_user_ids():
+    store = SessionStore(lambda user_id: user_id, max_sessions=5000)
+    user_ids = {store.create().chatbot for _ in range(2000)}
+    assert len(user_ids) == 2000
+
+
+def test_active_conversations_are_bounded_by_default(db):
+    db.add_user("user_1")
+    db.create_conversation("conversation_1", "user_1")
+    for i in range(60):
+        db.add_message("conversation_1", "user", f"message {i}")
+
+    conversation, = db.get_active_conversations()
+    assert len(conversation["messages"]) == 50
+    assert len(db.get_active_conversations(messages_per_conversation=None)[0]["messages"]) == 60
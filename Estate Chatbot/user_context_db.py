@@ -1,355 +1,559 @@
-import sqlite3
-import json
-import pandas as pd
-from datetime import datetime
-
-class UserContextDatabase:
-    def __init__(self, db_path="user_context.db"):
-        self.conn = sqlite3.connect(db_path,check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        self.create_tables()
-    
-    def create_tables(self):
-        """Create necessary database tables if they don't exist"""
-        # Users table
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            user_id TEXT PRIMARY KEY,
-            name TEXT,
-            age INTEGER,
-            gender TEXT,
-            income_level TEXT,
-            budget string,
-            favourite_colors TEXT,
-            owned_assets TEXT,
-            hobbies TEXT,
-            preferred_brands TEXT,
-            family_info TEXT,
-            created_at TIMESTAMP,
-            updated_at TIMESTAMP
-        )
-        ''')
-        
-        # Conversations table
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS conversations (
-            conversation_id TEXT PRIMARY KEY,
-            user_id TEXT,
-            start_time TIMESTAMP,
-            end_time TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (user_id)
-        )
-        ''')
-        
-        # Messages table
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS messages (
-            message_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            conversation_id TEXT,
-            sender TEXT,
-            message TEXT,
-            timestamp TIMESTAMP,
-            FOREIGN KEY (conversation_id) REFERENCES conversations (conversation_id)
-        )
-        ''')
-        
-        # User preferences table (for real estate preferences)
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_preferences (
-            preference_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT,
-            min_price REAL,
-            max_price REAL,
-            min_area REAL,
-            max_area REAL,
-            preferred_districts TEXT,
-            min_bedrooms INTEGER,
-            min_bathrooms INTEGER,
-            preferred_direction TEXT,
-            legal_state TEXT,
-            furniture_state TEXT,
-            FOREIGN KEY (user_id) REFERENCES users (user_id)
-        )
-        ''')
-        
-        # Staff suggestions table
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS staff_suggestions (
-            suggestion_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            conversation_id TEXT,
-            message_id INTEGER,
-            suggestion TEXT,
-            timestamp TIMESTAMP,
-            FOREIGN KEY (conversation_id) REFERENCES conversations (conversation_id),
-            FOREIGN KEY (message_id) REFERENCES messages (message_id)
-        )
-        ''')
-        
-        self.conn.commit()
-
-    def add_user(self, user_id, name=None, age=None, gender=None, income_level=None, budget=None, hobbies=None,
-                favourite_colors=None, owned_assets=None, preferred_brands=None, family_info=None):   
-        """Add a new user to the database"""
-        now = datetime.now()
-        
-        # Convert list/dict fields to JSON strings
-        favourite_colors = json.dumps(favourite_colors) if favourite_colors else None
-        owned_assets = json.dumps(owned_assets) if owned_assets else None
-        preferred_brands = json.dumps(preferred_brands) if preferred_brands else None
-        family_info = json.dumps(family_info) if family_info else None
-        
-        self.cursor.execute('''
-        INSERT OR REPLACE INTO users 
-        (user_id, name, age, gender, income_level, budget, hobbies, favourite_colors,  owned_assets, 
-         preferred_brands, family_info, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, name, age, gender, income_level, budget, hobbies, favourite_colors, owned_assets, 
-             preferred_brands, family_info, now, now))
-        
-        self.conn.commit()
-    
-    def update_user(self, user_id, **kwargs):
-        """Update user information"""
-        now = datetime.now()
-        
-        # First, get current user data
-        self.cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-        user_data = self.cursor.fetchone()
-        
-        if not user_data:
-            raise ValueError(f"User with ID {user_id} does not exist")
-        
-        # Prepare columns to update
-        columns = []
-        values = []
-        
-        for key, value in kwargs.items():
-            if key in ['favorite_colors', 'owned_assets', 'preferred_brands', 'family_info','hobbies'] and value is not None:
-                value = json.dumps(value)
-            columns.append(f"{key} = ?")
-            values.append(value)
-        
-        # Add updated_at
-        columns.append("updated_at = ?")
-        values.append(now)
-        
-        # Construct and execute update query
-        query = f"UPDATE users SET {', '.join(columns)} WHERE user_id = ?"
-        values.append(user_id)
-        
-        self.cursor.execute(query, values)
-        self.conn.commit()
-    
-    def add_user(self, user_id, name=None, age=None, gender=None, income_level=None, budget=None, hobbies=None,
-             favourite_colors=None, owned_assets=None, preferred_brands=None, family_info=None):   
-        """Add a new user to the database"""
-        now = datetime.now()
-        
-        # Convert list/dict fields to JSON strings
-        favourite_colors = json.dumps(favourite_colors) if favourite_colors else None
-        owned_assets = json.dumps(owned_assets) if owned_assets else None
-        preferred_brands = json.dumps(preferred_brands) if preferred_brands else None
-        family_info = json.dumps(family_info) if family_info else None
-        
-        # Insert or replace user data
-        self.cursor.execute('''
-        INSERT OR REPLACE INTO users 
-        (user_id, name, age, gender, income_level, budget, hobbies, favourite_colors, owned_assets, 
-        preferred_brands, family_info, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, name, age, gender, income_level, budget, hobbies, favourite_colors, owned_assets, 
-            preferred_brands, family_info, now, now))
-    
-        self.conn.commit()
-    
-    def create_conversation(self, conversation_id, user_id):
-        """Create a new conversation"""
-        now = datetime.now()
-        
-        self.cursor.execute('''
-        INSERT INTO conversations (conversation_id, user_id, start_time, end_time)
-        VALUES (?, ?, ?, NULL)
-        ''', (conversation_id, user_id, now))
-        
-        self.conn.commit()
-    
-    def end_conversation(self, conversation_id):
-        """Mark a conversation as ended"""
-        now = datetime.now()
-        
-        self.cursor.execute('''
-        UPDATE conversations SET end_time = ? WHERE conversation_id = ?
-        ''', (now, conversation_id))
-        
-        self.conn.commit()
-    
-    def add_message(self, conversation_id, sender, message):
-        """Add a message to a conversation"""
-        now = datetime.now()
-        
-        self.cursor.execute('''
-        INSERT INTO messages (conversation_id, sender, message, timestamp)
-        VALUES (?, ?, ?, ?)
-        ''', (conversation_id, sender, message, now))
-        
-        message_id = self.cursor.lastrowid
-        self.conn.commit()
-        
-        return message_id
-    
-    def add_staff_suggestion(self, conversation_id, message_id, suggestion):
-        """Add a staff suggestion"""
-        now = datetime.now()
-        
-        self.cursor.execute('''
-        INSERT INTO staff_suggestions (conversation_id, message_id, suggestion, timestamp)
-        VALUES (?, ?, ?, ?)
-        ''', (conversation_id, message_id, suggestion, now))
-        
-        self.conn.commit()
-    
-    def update_user_preferences(self, user_id, **kwargs):
-        """Update user real estate preferences"""
-        now = datetime.now()
-        
-        # Check if preferences exist for this user
-        self.cursor.execute('''
-        SELECT * FROM user_preferences WHERE user_id = ?
-        ''', (user_id,))
-        
-        preferences = self.cursor.fetchone()
-        
-        if preferences:
-            # Update existing preferences
-            columns = []
-            values = []
-            
-            for key, value in kwargs.items():
-                if key in ['preferred_districts', 'furniture_state', 'legal_state'] and value is not None:
-                    value = json.dumps(value)
-                columns.append(f"{key} = ?")
-                values.append(value)
-            
-            
-            
-            # Construct and execute update query
-            query = f"UPDATE user_preferences SET {', '.join(columns)} WHERE user_id = ?"
-            values.append(user_id)
-            
-            self.cursor.execute(query, values)
-        else:
-            # Insert new preferences
-            min_price = kwargs.get('min_price')
-            max_price = kwargs.get('max_price')
-            min_area = kwargs.get('min_area')
-            max_area = kwargs.get('max_area')
-            preferred_districts = json.dumps(kwargs.get('preferred_districts', [])) if 'preferred_districts' in kwargs else None
-            min_bedrooms = kwargs.get('min_bedrooms')
-            min_bathrooms = kwargs.get('min_bathrooms')
-            preferred_direction = kwargs.get('preferred_direction')
-            furniture_state = kwargs.get('furniture_state')
-            legal_state = kwargs.get('legal_state')
-            
-            
-            self.cursor.execute('''
-            INSERT INTO user_preferences
-            (user_id, min_price, max_price, min_area, max_area, preferred_districts,
-             min_bedrooms, min_bathrooms, preferred_direction, furniture_state, legal_state )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (user_id, min_price, max_price, min_area, max_area, preferred_districts,
-                 min_bedrooms, min_bathrooms, preferred_direction, furniture_state, legal_state))
-        
-        self.conn.commit()
-    
-    def get_user(self, user_id):
-        """Retrieve user information"""
-        self.cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-        user_data = self.cursor.fetchone()
-        
-        if not user_data:
-            return None
-        
-        # Column names
-        columns = [desc[0] for desc in self.cursor.description]
-        user_dict = dict(zip(columns, user_data))
-        
-        # Parse JSON fields
-        for field in ['favourite_colors', 'owned_assets', 'preferred_brands', 'family_info']:
-            if user_dict[field]:
-                user_dict[field] = json.loads(user_dict[field])
-        
-        # The `hobbies` field is already in plain text, no need to decode
-        return user_dict
-
-    def get_user_preferences(self, user_id):
-        """Retrieve user preferences from the database"""
-        try:
-            query = "SELECT * FROM user_preferences WHERE user_id = ?"
-            self.cursor.execute(query, (user_id,))
-            result = self.cursor.fetchone()  # Fetch a single row
-
-            if result:
-                # If `result` is a tuple, map it to column names
-                column_names = [desc[0] for desc in self.cursor.description]
-                preferences_dict = dict(zip(column_names, result))
-                return preferences_dict
-            else:
-                return None  # No preferences found
-
-        except Exception as e:
-            return None
-    
-    def get_conversation_history(self, conversation_id, limit=50):
-        """Get recent conversation history"""
-        self.cursor.execute('''
-        SELECT * FROM messages 
-        WHERE conversation_id = ? 
-        ORDER BY timestamp DESC 
-        LIMIT ?
-        ''', (conversation_id, limit))
-        
-        messages = self.cursor.fetchall()
-        
-        # Convert to list of dictionaries
-        columns = [desc[0] for desc in self.cursor.description]
-        messages = [dict(zip(columns, message)) for message in messages]
-        
-        # Sort by timestamp (oldest first)
-        messages.sort(key=lambda x: x['timestamp'])
-        
-        return messages
-    # Add these new methods to the UserContextDatabase class
-
-    def get_active_conversations(self):
-        """Get all active conversations with their recent messages"""
-        self.cursor.execute('''
-        SELECT c.conversation_id, c.user_id, c.start_time,
-            m.sender, m.message, m.timestamp
-        FROM conversations c
-        LEFT JOIN messages m ON c.conversation_id = m.conversation_id
-        WHERE c.end_time IS NULL
-        ORDER BY c.start_time DESC, m.timestamp DESC
-        ''')
-        
-        conversations = {}
-        for row in self.cursor.fetchall():
-            conv_id = row[0]
-            if conv_id not in conversations:
-                conversations[conv_id] = {
-                    'conversation_id': conv_id,
-                    'user_id': row[1],
-                    'start_time': row[2],
-                    'messages': []
-                }
-            if row[3]:  # if there are messages
-                conversations[conv_id]['messages'].append({
-                    'sender': row[3],
-                    'message': row[4],
-                    'timestamp': row[5]
-                })
-        
-        return list(conversations.values())
-
-    def close(self):
-        """Close the database connection"""
+import sqlite3
+import json
+import threading
+import pandas as pd
+from datetime import datetime
+from contextlib import contextmanager
+from functools import wraps
+
+
+def synchronized(method):
+    """Serialize calls that share the connection and cursor across threads"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+# Schema migrations as (version, statements), applied in order on startup.
+# PRAGMA user_version records the last version applied to a database file.
+SCHEMA_MIGRATIONS = [
+    (1, [
+        # get_conversation_history: WHERE conversation_id = ? ORDER BY timestamp
+        "CREATE INDEX IF NOT EXISTS idx_messages_conversation_time ON messages (conversation_id, timestamp)",
+        # get_active_conversations: WHERE end_time IS NULL ORDER BY start_time
+        "CREATE INDEX IF NOT EXISTS idx_conversations_active ON conversations (start_time) WHERE end_time IS NULL",
+        "CREATE INDEX IF NOT EXISTS idx_conversations_user ON conversations (user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_staff_suggestions_conversation ON staff_suggestions (conversation_id)",
+        # One preferences row per user; keep the row get_user_preferences used to return
+        '''
+        DELETE FROM user_preferences WHERE preference_id NOT IN (
+            SELECT MIN(preference_id) FROM user_preferences GROUP BY user_id
+        )
+        ''',
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_user_preferences_user ON user_preferences (user_id)",
+    ]),
+]
+
+
+class UserContextDatabase:
+    def __init__(self, db_path="user_context.db", journal_mode="WAL", synchronous="NORMAL",
+                 flush_interval=None, max_pending=100):
+        """Open the database.
+
+        journal_mode and synchronous are passed to the matching PRAGMAs. By default
+        every write commits on its own (grouped only inside transaction()); with
+        flush_interval set (seconds), commits are deferred and flushed on a timer
+        or once max_pending writes are waiting, whichever comes first.
+        """
+        self.conn = sqlite3.connect(db_path,check_same_thread=False)
+        self.lock = threading.RLock()
+        self.cursor = self.conn.cursor()
+        self.listeners = []
+
+        self.cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        self.cursor.execute(f"PRAGMA synchronous={synchronous}")
+
+        # Unit-of-work / write-behind state
+        self.transaction_depth = 0
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending_writes = 0
+        self.flush_timer = None
+
+        self.create_tables()
+    
+    @contextmanager
+    def transaction(self):
+        """Group every write made inside the block into a single commit.
+
+        Holds the connection lock for the whole block, so writes from other
+        threads wait instead of committing a half-finished unit of work.
+        Blocks may be nested; only the outermost one commits.
+        """
+        with self.lock:
+            if self.transaction_depth == 0 and self.pending_writes:
+                # Keep deferred writes out of a possible rollback
+                self.flush()
+            self.transaction_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self.transaction_depth -= 1
+                if self.transaction_depth == 0:
+                    self.conn.rollback()
+                    self.pending_writes = 0
+                raise
+            self.transaction_depth -= 1
+            if self.transaction_depth == 0:
+                self._commit()
+    
+    def _commit(self):
+        """Commit now, or defer it while in a transaction / write-behind mode"""
+        if self.transaction_depth:
+            return
+        if self.flush_interval is None:
+            self.conn.commit()
+            return
+
+        self.pending_writes += 1
+        if self.pending_writes >= self.max_pending:
+            self.flush()
+        elif self.flush_timer is None:
+            self.flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self.flush_timer.daemon = True
+            self.flush_timer.start()
+    
+    @synchronized
+    def flush(self):
+        """Commit deferred writes"""
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        if self.transaction_depth:
+            return
+        self.pending_writes = 0
+        self.conn.commit()
+    
+    def add_listener(self, callback):
+        """Register callback(event, user_id), called after a user or preferences write.
+
+        event is 'user' or 'preferences'. Callbacks run on the thread that did the
+        write, so UI code must hand the work over to its own thread.
+        """
+        self.listeners.append(callback)
+    
+    def remove_listener(self, callback):
+        """Unregister a callback added with add_listener"""
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+    
+    def _notify(self, event, user_id):
+        for callback in list(self.listeners):
+            callback(event, user_id)
+    
+    @synchronized
+    def create_tables(self):
+        """Create necessary database tables if they don't exist"""
+        # Users table
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            name TEXT,
+            age INTEGER,
+            gender TEXT,
+            income_level TEXT,
+            budget string,
+            favourite_colors TEXT,
+            owned_assets TEXT,
+            hobbies TEXT,
+            preferred_brands TEXT,
+            family_info TEXT,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP
+        )
+        ''')
+        
+        # Conversations table
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS conversations (
+            conversation_id TEXT PRIMARY KEY,
+            user_id TEXT,
+            start_time TIMESTAMP,
+            end_time TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        ''')
+        
+        # Messages table
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS messages (
+            message_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id TEXT,
+            sender TEXT,
+            message TEXT,
+            timestamp TIMESTAMP,
+            FOREIGN KEY (conversation_id) REFERENCES conversations (conversation_id)
+        )
+        ''')
+        
+        # User preferences table (for real estate preferences)
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_preferences (
+            preference_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            min_price REAL,
+            max_price REAL,
+            min_area REAL,
+            max_area REAL,
+            preferred_districts TEXT,
+            min_bedrooms INTEGER,
+            min_bathrooms INTEGER,
+            preferred_direction TEXT,
+            legal_state TEXT,
+            furniture_state TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        ''')
+        
+        # Staff suggestions table
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS staff_suggestions (
+            suggestion_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id TEXT,
+            message_id INTEGER,
+            suggestion TEXT,
+            timestamp TIMESTAMP,
+            FOREIGN KEY (conversation_id) REFERENCES conversations (conversation_id),
+            FOREIGN KEY (message_id) REFERENCES messages (message_id)
+        )
+        ''')
+
+        self._commit()
+
+        # Bring indexes and constraints up to date (also upgrades existing databases)
+        self.migrate()
+
+    @synchronized
+    def migrate(self):
+        """Apply pending SCHEMA_MIGRATIONS, each in its own transaction"""
+        self.cursor.execute("PRAGMA user_version")
+        current_version = self.cursor.fetchone()[0]
+
+        for version, statements in SCHEMA_MIGRATIONS:
+            if version <= current_version:
+                continue
+            with self.transaction():
+                if not self.conn.in_transaction:
+                    self.cursor.execute("BEGIN")
+                for statement in statements:
+                    self.cursor.execute(statement)
+                self.cursor.execute(f"PRAGMA user_version = {version}")
+
+    @synchronized
+    def add_user(self, user_id, name=None, age=None, gender=None, income_level=None, budget=None, hobbies=None,
+                favourite_colors=None, owned_assets=None, preferred_brands=None, family_info=None):   
+        """Add a new user to the database (IntegrityError if the id is taken)"""
+        now = datetime.now()
+        
+        # Convert list/dict fields to JSON strings
+        favourite_colors = json.dumps(favourite_colors) if favourite_colors else None
+        owned_assets = json.dumps(owned_assets) if owned_assets else None
+        preferred_brands = json.dumps(preferred_brands) if preferred_brands else None
+        family_info = json.dumps(family_info) if family_info else None
+        
+        self.cursor.execute('''
+        INSERT INTO users
+        (user_id, name, age, gender, income_level, budget, hobbies, favourite_colors,  owned_assets, 
+         preferred_brands, family_info, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, name, age, gender, income_level, budget, hobbies, favourite_colors, owned_assets, 
+             preferred_brands, family_info, now, now))
+        
+        self._commit()
+    
+    @synchronized
+    def update_user(self, user_id, **kwargs):
+        """Update user information"""
+        now = datetime.now()
+        
+        # First, get current user data
+        self.cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
+        user_data = self.cursor.fetchone()
+        
+        if not user_data:
+            raise ValueError(f"User with ID {user_id} does not exist")
+        
+        # Prepare columns to update
+        columns = []
+        values = []
+        
+        for key, value in kwargs.items():
+            if key in ['favorite_colors', 'owned_assets', 'preferred_brands', 'family_info','hobbies'] and value is not None:
+                value = json.dumps(value)
+            columns.append(f"{key} = ?")
+            values.append(value)
+        
+        # Add updated_at
+        columns.append("updated_at = ?")
+        values.append(now)
+        
+        # Construct and execute update query
+        query = f"UPDATE users SET {', '.join(columns)} WHERE user_id = ?"
+        values.append(user_id)
+        
+        self.cursor.execute(query, values)
+        self._commit()
+        self._notify('user', user_id)
+    
+    @synchronized
+    def add_user(self, user_id, name=None, age=None, gender=None, income_level=None, budget=None, hobbies=None,
+             favourite_colors=None, owned_assets=None, preferred_brands=None, family_info=None):   
+        """Add a new user to the database (IntegrityError if the id is taken)"""
+        now = datetime.now()
+        
+        # Convert list/dict fields to JSON strings
+        favourite_colors = json.dumps(favourite_colors) if favourite_colors else None
+        owned_assets = json.dumps(owned_assets) if owned_assets else None
+        preferred_brands = json.dumps(preferred_brands) if preferred_brands else None
+        family_info = json.dumps(family_info) if family_info else None
+        
+        # Plain insert: an existing user is never overwritten
+        self.cursor.execute('''
+        INSERT INTO users
+        (user_id, name, age, gender, income_level, budget, hobbies, favourite_colors, owned_assets, 
+        preferred_brands, family_info, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, name, age, gender, income_level, budget, hobbies, favourite_colors, owned_assets, 
+            preferred_brands, family_info, now, now))
+    
+        self._commit()
+        self._notify('user', user_id)
+    
+    @synchronized
+    def create_conversation(self, conversation_id, user_id):
+        """Create a new conversation"""
+        now = datetime.now()
+        
+        self.cursor.execute('''
+        INSERT INTO conversations (conversation_id, user_id, start_time, end_time)
+        VALUES (?, ?, ?, NULL)
+        ''', (conversation_id, user_id, now))
+        
+        self._commit()
+    
+    @synchronized
+    def end_conversation(self, conversation_id):
+        """Mark a conversation as ended"""
+        now = datetime.now()
+        
+        self.cursor.execute('''
+        UPDATE conversations SET end_time = ? WHERE conversation_id = ?
+        ''', (now, conversation_id))
+        
+        self._commit()
+    
+    @synchronized
+    def add_message(self, conversation_id, sender, message):
+        """Add a message to a conversation"""
+        now = datetime.now()
+        
+        self.cursor.execute('''
+        INSERT INTO messages (conversation_id, sender, message, timestamp)
+        VALUES (?, ?, ?, ?)
+        ''', (conversation_id, sender, message, now))
+        
+        message_id = self.cursor.lastrowid
+        self._commit()
+        
+        return message_id
+    
+    @synchronized
+    def add_staff_suggestion(self, conversation_id, message_id, suggestion):
+        """Add a staff suggestion"""
+        now = datetime.now()
+        
+        self.cursor.execute('''
+        INSERT INTO staff_suggestions (conversation_id, message_id, suggestion, timestamp)
+        VALUES (?, ?, ?, ?)
+        ''', (conversation_id, message_id, suggestion, now))
+        
+        self._commit()
+    
+    @synchronized
+    def update_user_preferences(self, user_id, **kwargs):
+        """Update user real estate preferences"""
+        now = datetime.now()
+        
+        # Check if preferences exist for this user
+        self.cursor.execute('''
+        SELECT * FROM user_preferences WHERE user_id = ?
+        ''', (user_id,))
+        
+        preferences = self.cursor.fetchone()
+        
+        if preferences:
+            # Update existing preferences
+            columns = []
+            values = []
+            
+            for key, value in kwargs.items():
+                if key in ['preferred_districts', 'furniture_state', 'legal_state'] and value is not None:
+                    value = json.dumps(value)
+                columns.append(f"{key} = ?")
+                values.append(value)
+            
+            
+            
+            # Construct and execute update query
+            query = f"UPDATE user_preferences SET {', '.join(columns)} WHERE user_id = ?"
+            values.append(user_id)
+            
+            self.cursor.execute(query, values)
+        else:
+            # Insert new preferences
+            min_price = kwargs.get('min_price')
+            max_price = kwargs.get('max_price')
+            min_area = kwargs.get('min_area')
+            max_area = kwargs.get('max_area')
+            preferred_districts = json.dumps(kwargs.get('preferred_districts', [])) if 'preferred_districts' in kwargs else None
+            min_bedrooms = kwargs.get('min_bedrooms')
+            min_bathrooms = kwargs.get('min_bathrooms')
+            preferred_direction = kwargs.get('preferred_direction')
+            furniture_state = kwargs.get('furniture_state')
+            legal_state = kwargs.get('legal_state')
+            
+            
+            self.cursor.execute('''
+            INSERT INTO user_preferences
+            (user_id, min_price, max_price, min_area, max_area, preferred_districts,
+             min_bedrooms, min_bathrooms, preferred_direction, furniture_state, legal_state )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, min_price, max_price, min_area, max_area, preferred_districts,
+                 min_bedrooms, min_bathrooms, preferred_direction, furniture_state, legal_state))
+        
+        self._commit()
+        self._notify('preferences', user_id)
+    
+    @synchronized
+    def get_user(self, user_id):
+        """Retrieve user information"""
+        self.cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
+        user_data = self.cursor.fetchone()
+        
+        if not user_data:
+            return None
+        
+        # Column names
+        columns = [desc[0] for desc in self.cursor.description]
+        user_dict = dict(zip(columns, user_data))
+        
+        # Parse JSON fields
+        for field in ['favourite_colors', 'owned_assets', 'preferred_brands', 'family_info']:
+            if user_dict[field]:
+                user_dict[field] = json.loads(user_dict[field])
+        
+        # The `hobbies` field is already in plain text, no need to decode
+        return user_dict
+
+    @synchronized
+    def get_user_preferences(self, user_id):
+        """Retrieve user preferences from the database"""
+        try:
+            query = "SELECT * FROM user_preferences WHERE user_id = ?"
+            self.cursor.execute(query, (user_id,))
+            result = self.cursor.fetchone()  # Fetch a single row
+
+            if result:
+                # If `result` is a tuple, map it to column names
+                column_names = [desc[0] for desc in self.cursor.description]
+                preferences_dict = dict(zip(column_names, result))
+                return preferences_dict
+            else:
+                return None  # No preferences found
+
+        except Exception as e:
+            return None
+    
+    @synchronized
+    def get_conversation_history(self, conversation_id, limit=50):
+        """Get recent conversation history"""
+        self.cursor.execute('''
+        SELECT * FROM messages 
+        WHERE conversation_id = ? 
+        ORDER BY timestamp DESC 
+        LIMIT ?
+        ''', (conversation_id, limit))
+        
+        messages = self.cursor.fetchall()
+        
+        # Convert to list of dictionaries
+        columns = [desc[0] for desc in self.cursor.description]
+        messages = [dict(zip(columns, message)) for message in messages]
+        
+        # Sort by timestamp (oldest first)
+        messages.sort(key=lambda x: x['timestamp'])
+        
+        return messages
+    # Add these new methods to the UserContextDatabase class
+
+    @synchronized
+    def get_active_conversations_page(self, limit=50, messages_per_conversation=10, after=None):
+        """Get one page of active conversations, newest first, with their last messages.
+
+        after is the cursor returned with the previous page (None for the first).
+        Returns (conversations, next_cursor); next_cursor is None on the last page.
+        Only pass messages_per_conversation=None if every message is really needed.
+        """
+        message_limit = -1 if messages_per_conversation is None else messages_per_conversation
+        after_time, after_id = after if after else (None, None)
+        
+        # Keyset pagination on (start_time, conversation_id); only the last N
+        # messages of each conversation on the page are read, via the
+        # (conversation_id, timestamp) index
+        self.cursor.execute('''
+        WITH page AS (
+            SELECT conversation_id, user_id, start_time
+            FROM conversations
+            WHERE end_time IS NULL
+              AND (? IS NULL OR (start_time, conversation_id) < (?, ?))
+            ORDER BY start_time DESC, conversation_id DESC
+            LIMIT ?
+        )
+        SELECT p.conversation_id, p.user_id, p.start_time,
+            m.sender, m.message, m.timestamp
+        FROM page p
+        LEFT JOIN messages m ON m.message_id IN (
+            SELECT message_id FROM messages
+            WHERE conversation_id = p.conversation_id
+            ORDER BY timestamp DESC
+            LIMIT ?
+        )
+        ORDER BY p.start_time DESC, p.conversation_id DESC, m.timestamp DESC
+        ''', (after_time, after_time, after_id, limit, message_limit))
+        
+        conversations = {}
+        for row in self.cursor.fetchall():
+            conv_id = row[0]
+            if conv_id not in conversations:
+                conversations[conv_id] = {
+                    'conversation_id': conv_id,
+                    'user_id': row[1],
+                    'start_time': row[2],
+                    'messages': []
+                }
+            if row[3]:  # if there are messages
+                conversations[conv_id]['messages'].append({
+                    'sender': row[3],
+                    'message': row[4],
+                    'timestamp': row[5]
+                })
+        
+        conversations = list(conversations.values())
+        next_cursor = None
+        if len(conversations) == limit:
+            last = conversations[-1]
+            next_cursor = (last['start_time'], last['conversation_id'])
+        return conversations, next_cursor
+    
+    def iter_active_conversations(self, page_size=50, messages_per_conversation=10):
+        """Yield active conversations page by page, so memory stays bounded"""
+        cursor = None
+        while True:
+            conversations, cursor = self.get_active_conversations_page(
+                page_size, messages_per_conversation, after=cursor
+            )
+            yield from conversations
+            if cursor is None:
+                return
+    
+    def get_active_conversations(self, messages_per_conversation=50):
+        """Get all active conversations with their last messages (None for every message)"""
+        return list(self.iter_active_conversations(messages_per_conversation=messages_per_conversation))
+
+    @synchronized
+    def close(self):
+        """Flush deferred writes and close the database connection"""
+        self.flush()
         self.conn.close()
\ No newline at end of file